@@ -0,0 +1,131 @@
+"""
+缓存编解码基准测试
+对比原先的 JSON 文本编码与 msgpack / msgpack + 压缩的编解码耗时和体积
+
+运行方式（需要安装 shared 的依赖）:
+    python benchmarks/cache_codec_benchmark.py
+
+设置 REDIS_URL 时会额外写入样本并用 MEMORY USAGE 统计 Redis 实际占用:
+    REDIS_URL=redis://localhost:6379 python benchmarks/cache_codec_benchmark.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from shared.utils.cache_codec import CacheCodec, msgpack, lz4_frame  # noqa: E402
+
+ITERATIONS = 20_000
+
+
+def word_detail(word_id: int) -> dict:
+    """单词详情缓存值（word:{id}）"""
+    return {
+        "word_id": word_id,
+        "english_word": f"coffee{word_id}",
+        "chinese_meaning": "咖啡；咖啡色；一杯咖啡",
+        "phonetic_us": "/ˈkɔːfi/",
+        "phonetic_uk": "/ˈkɒfi/",
+        "audio_url": None,
+        "example_sentence": "Would you like a cup of coffee?",
+        "example_translation": "你想来杯咖啡吗？",
+        "image_url": None,
+    }
+
+
+def cached_envelope(value) -> dict:
+    """@cached 装饰器写入的包装结构"""
+    return {"__cached__": 1, "value": value, "expires_at": time.time() + 3600, "delta": 0.012}
+
+
+SAMPLES = {
+    "word detail": word_detail(1),
+    "word list (50)": cached_envelope([word_detail(i) for i in range(50)]),
+    "tags list": [{"tag_id": i, "tag_name": f"标签{i}", "color": "#3B82F6"} for i in range(12)],
+}
+
+
+def json_encode(value) -> bytes:
+    """原先的实现：json.dumps 后以 UTF-8 文本写入"""
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def json_decode(raw: bytes):
+    return json.loads(raw.decode("utf-8"))
+
+
+def build_codecs():
+    codecs = {"json (legacy)": (json_encode, json_decode)}
+    if msgpack is None:
+        print("msgpack 未安装，仅对比 JSON + 压缩\n")
+    for name, codec in (
+        ("msgpack", CacheCodec("msgpack", "none")),
+        ("msgpack + zlib", CacheCodec("msgpack", "zlib")),
+        ("msgpack + lz4", CacheCodec("msgpack", "lz4") if lz4_frame else None),
+        ("json + zlib", CacheCodec("json", "zlib")),
+    ):
+        if codec is not None:
+            codecs[name] = (codec.encode, codec.decode)
+    return codecs
+
+
+def bench(encode, decode, value):
+    """返回 (编码 µs, 解码 µs, 字节数)"""
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        raw = encode(value)
+    encode_time = (time.perf_counter() - start) / ITERATIONS
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        decode(raw)
+    decode_time = (time.perf_counter() - start) / ITERATIONS
+
+    assert decode(raw) == value
+    return encode_time * 1e6, decode_time * 1e6, len(raw)
+
+
+async def redis_memory_usage(encoded: dict):
+    """写入 Redis 并统计 MEMORY USAGE（字节）"""
+    import redis.asyncio as redis
+
+    client = redis.from_url(os.environ["REDIS_URL"], decode_responses=False)
+    usage = {}
+    try:
+        for name, raw in encoded.items():
+            key = f"bench:codec:{name}"
+            await client.set(key, raw, ex=60)
+            usage[name] = await client.memory_usage(key)
+            await client.delete(key)
+    finally:
+        await client.close()
+    return usage
+
+
+def main():
+    codecs = build_codecs()
+
+    for sample_name, value in SAMPLES.items():
+        print(f"== {sample_name} ==")
+        encoded = {}
+        baseline = None
+        for name, (encode, decode) in codecs.items():
+            enc, dec, size = bench(encode, decode, value)
+            encoded[name] = encode(value)
+            baseline = baseline or size
+            print(f"{name:<16} encode {enc:7.2f} µs  decode {dec:7.2f} µs  "
+                  f"{size:6d} bytes ({size / baseline:.0%})")
+
+        if os.getenv("REDIS_URL"):
+            usage = asyncio.run(redis_memory_usage(encoded))
+            for name, used in usage.items():
+                print(f"{name:<16} redis MEMORY USAGE {used} bytes")
+        print()
+
+
+if __name__ == "__main__":
+    main()
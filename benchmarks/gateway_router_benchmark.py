@@ -0,0 +1,102 @@
+"""
+网关路由微基准测试
+对比原先的线性前缀扫描与预编译前缀树路由器（PrefixRouter）
+
+运行方式（需要安装 api-gateway 的依赖）:
+    python benchmarks/gateway_router_benchmark.py
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+# 加载 API 网关模块（网关依赖 shared 模块）
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "services" / "api-gateway"))
+
+from main import ROUTE_PREFIXES, PRESERVE_PREFIX_ROUTES, PrefixRouter  # noqa: E402
+
+# 接近线上流量分布的路径样本
+PATH_MIX = [
+    ("/word/list", 20),
+    ("/word/lookup/coffee", 10),
+    ("/word/123", 8),
+    ("/vocabulary/tags", 5),
+    ("/tags/list", 5),
+    ("/practice/review", 12),
+    ("/review/today", 6),
+    ("/progress/stats", 4),
+    ("/photo/recognize", 8),
+    ("/analyze", 3),
+    ("/user/me", 8),
+    ("/login", 3),
+    ("/me", 2),
+    ("/tts/synthesize", 4),
+    ("/asr/evaluate-pronunciation", 6),
+    ("/anonymous-login", 2),
+]
+
+
+def linear_determine_service(path: str):
+    """原先的实现：按字典顺序逐个前缀扫描"""
+    path = path.lower()
+    original_path = path
+
+    for service, prefixes in ROUTE_PREFIXES.items():
+        for prefix in prefixes:
+            if path == prefix:
+                return service, "/"
+            elif path.startswith(prefix + "/"):
+                if prefix in PRESERVE_PREFIX_ROUTES:
+                    return service, path
+                else:
+                    return service, path[len(prefix):]
+
+    return "auth", "/" + original_path
+
+
+def build_workload(size: int, unique_ids: int):
+    """按权重生成请求路径，部分路径带随机 ID（模拟缓存未命中）"""
+    rng = random.Random(42)
+    paths, weights = zip(*PATH_MIX)
+    workload = []
+    for path in rng.choices(paths, weights=weights, k=size):
+        if path.endswith("/123"):
+            path = f"/word/{rng.randint(1, unique_ids)}"
+        workload.append(path)
+    return workload
+
+
+def bench(name: str, func, workload, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for path in workload:
+            func(path)
+        best = min(best, time.perf_counter() - start)
+    per_call_ns = best / len(workload) * 1e9
+    print(f"{name:<28} {best * 1000:8.2f} ms  {per_call_ns:8.1f} ns/call")
+    return best
+
+
+def main():
+    workload = build_workload(size=200_000, unique_ids=5_000)
+
+    # 校验两种实现结果一致
+    router = PrefixRouter(ROUTE_PREFIXES, PRESERVE_PREFIX_ROUTES)
+    for path in set(workload):
+        assert router.resolve(path) == linear_determine_service(path), path
+
+    uncached = PrefixRouter(ROUTE_PREFIXES, PRESERVE_PREFIX_ROUTES)
+
+    print(f"workload: {len(workload)} requests, {len(set(workload))} unique paths\n")
+    linear = bench("linear scan", linear_determine_service, workload)
+    trie = bench("prefix trie (no cache)", uncached._resolve, workload)
+    cached = bench("prefix trie + LRU", router.resolve, workload)
+
+    print(f"\nspeedup: trie {linear / trie:.2f}x, trie+LRU {linear / cached:.2f}x")
+    print(f"cache: {router.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
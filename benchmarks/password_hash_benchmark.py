@@ -0,0 +1,87 @@
+"""
+登录洪峰下的事件循环延迟基准测试
+对比在协程中直接调用 bcrypt 与放到有界线程池（PasswordHasher）执行
+
+同时运行一个每 10ms 唤醒一次的探针协程，记录实际唤醒时间与预期的偏差（事件循环延迟），
+它代表同一进程中其他请求（如 /me、/refresh）在登录洪峰期间需要额外等待的时间。
+
+运行方式（需要安装 auth-service 的依赖）:
+    python benchmarks/password_hash_benchmark.py
+    python benchmarks/password_hash_benchmark.py --logins 64 --workers 4 --max-pending 32
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import HTTPException  # noqa: E402
+from shared.utils.auth import PasswordHasher, hash_password, verify_password  # noqa: E402
+
+PROBE_INTERVAL = 0.01
+
+
+async def lag_probe(samples: list, stop: asyncio.Event):
+    """记录事件循环延迟（秒）"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def run_storm(name: str, login, logins: int, password_hash: str):
+    samples: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(lag_probe(samples, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 3)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(login("correct horse battery staple", password_hash) for _ in range(logins)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+
+    ok = sum(1 for result in results if result is True)
+    rejected = sum(1 for result in results if isinstance(result, HTTPException))
+    ordered = sorted(samples)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0
+    print(
+        f"{name:<22} {elapsed:6.2f}s  ok={ok:<3} 503={rejected:<3} "
+        f"loop lag p50={statistics.median(samples) * 1000:7.1f}ms "
+        f"p95={p95 * 1000:7.1f}ms max={max(samples) * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="bcrypt 事件循环延迟基准测试")
+    parser.add_argument("--logins", type=int, default=32, help="并发登录数")
+    parser.add_argument("--workers", type=int, default=4, help="线程池大小")
+    parser.add_argument("--max-pending", type=int, default=32, help="最大排队数")
+    args = parser.parse_args()
+
+    password_hash = hash_password("correct horse battery staple")
+    print(f"{args.logins} concurrent logins, workers={args.workers}, max_pending={args.max_pending}\n")
+
+    async def inline_login(password, hashed):
+        return verify_password(password, hashed)
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.max_pending)
+
+    async def offloaded_login(password, hashed):
+        return await hasher.run(verify_password, password, hashed)
+
+    await run_storm("inline bcrypt", inline_login, args.logins, password_hash)
+    await run_storm("bounded executor", offloaded_login, args.logins, password_hash)
+    print(f"\nhasher stats: {hasher.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+头像迁移脚本：把 users.avatar_url 中的 base64 图片提取到对象存储
+
+迁移后 avatar_url 只保存短 URL（/user/avatar/<哈希>），读取用户行不再传输图片数据。
+已经是 URL 的值不会改动，脚本可以重复执行。
+
+使用方法：
+1. 设置数据库连接（POSTGRES_HOST/PORT/USER/PASSWORD/DB，MySQL 为 DB_TYPE=mysql + MYSQL_*）、
+   AVATAR_PUBLIC_BASE_URL 以及对象存储配置
+   （BLOB_STORAGE=s3 + BLOB_S3_*，或 BLOB_STORAGE_DIR 指向持久化卷；未配置时脚本拒绝执行），
+   以及与服务相同的 REDIS_URL（迁移后清除用户快照和匿名登录缓存，避免继续返回旧的 base64 头像）
+2. 先预览：python migrations/migrate_avatars_to_blob_store.py --dry-run
+3. 执行迁移：python migrations/migrate_avatars_to_blob_store.py --batch-size 100
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+from sqlalchemy import text
+from shared.database.database import async_engine
+from shared.storage.avatar import AvatarError, check_avatar_config, get_avatar_store, is_inline_avatar
+from shared.utils.auth import invalidate_anonymous_login, invalidate_user_snapshot
+
+
+async def migrate(batch_size: int, dry_run: bool):
+    """按 user_id 分批迁移"""
+    # 头像迁移后数据库只保留 URL，存储位置必须是持久化的
+    try:
+        check_avatar_config()
+    except RuntimeError as e:
+        print(f"❌ 头像存储配置不完整，拒绝迁移: {e}")
+        await async_engine.dispose()
+        sys.exit(1)
+    store = get_avatar_store()
+    last_user_id = 0
+    migrated = failed = skipped = 0
+    bytes_before = bytes_after = 0
+
+    print(f"🔄 开始迁移头像（每批 {batch_size} 个用户{'，预览模式' if dry_run else ''}）...")
+
+    while True:
+        # 只取出内联头像（不以 http 或 / 开头的值）
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT user_id, avatar_url, device_id FROM users "
+                "WHERE user_id > :last_user_id AND avatar_url IS NOT NULL "
+                "AND avatar_url NOT LIKE 'http%' AND avatar_url NOT LIKE '/%' "
+                "ORDER BY user_id LIMIT :batch_size"
+            ), {"last_user_id": last_user_id, "batch_size": batch_size})
+            rows = result.fetchall()
+
+        if not rows:
+            break
+
+        updates = []
+        for user_id, avatar, device_id in rows:
+            last_user_id = user_id
+            if not is_inline_avatar(avatar):
+                skipped += 1
+                continue
+            try:
+                url = await store.save_inline(avatar) if not dry_run else None
+            except AvatarError as e:
+                print(f"⚠️  用户 {user_id} 头像无法迁移: {e}")
+                failed += 1
+                continue
+            bytes_before += len(avatar)
+            if url:
+                bytes_after += len(url)
+                updates.append({"user_id": user_id, "avatar_url": url, "device_id": device_id})
+            migrated += 1
+
+        if updates:
+            async with async_engine.begin() as conn:
+                await conn.execute(
+                    text("UPDATE users SET avatar_url = :avatar_url WHERE user_id = :user_id"),
+                    [{"user_id": u["user_id"], "avatar_url": u["avatar_url"]} for u in updates]
+                )
+            # 提交后清除缓存的用户资料，否则缓存过期前仍返回旧的 base64 头像
+            for update in updates:
+                await invalidate_user_snapshot(update["user_id"])
+                await invalidate_anonymous_login(update["device_id"])
+
+        print(f"  已处理到 user_id={last_user_id}: 迁移 {migrated}，失败 {failed}")
+
+    print("\n✅ 迁移完成" if not dry_run else "\n✅ 预览完成")
+    print(f"  迁移: {migrated}，失败: {failed}，跳过: {skipped}")
+    print(f"  users.avatar_url 数据量: {bytes_before} 字节 -> {bytes_after if not dry_run else '-'} 字节")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把 base64 头像迁移到对象存储")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批处理的用户数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入存储和数据库")
+    args = parser.parse_args()
+
+    asyncio.run(migrate(args.batch_size, args.dry_run))
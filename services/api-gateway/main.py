@@ -10,14 +10,21 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 import httpx
 import os
-import json
-from typing import Dict, Tuple
+import time
+import asyncio
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+from functools import lru_cache
 import logging
 
+from shared.utils.cache import init_cache
+from shared.utils.rate_limit import RATE_LIMIT_TRUSTED_PROXIES, RateLimitMiddleware, get_rate_limiter
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +36,42 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# 网关限流：在代理到上游之前拒绝超额请求
+# 网关按客户端 IP 计数（学校等共享 NAT 的用户共用一个计数），只做高于服务端限额的兜底，
+# 实际配额由各服务判断；每个列出的路由单独计数，未列出的路径 GET 为 QUERY_BACKSTOP，其余为 WRITE_BACKSTOP
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+GATEWAY_RATE_LIMIT_POLICIES = {
+    "/auth/login": "AUTH_BACKSTOP",
+    "/auth/register": "AUTH_BACKSTOP",
+    "/auth/send-code": "AUTH_BACKSTOP",
+    "/auth/reset-password": "AUTH_BACKSTOP",
+    "/login": "AUTH_BACKSTOP",
+    "/register": "AUTH_BACKSTOP",
+    "/user/change-password": "AUTH_BACKSTOP",
+    "/photo/recognize": "EXPENSIVE_BACKSTOP",
+    "/analyze": "EXPENSIVE_BACKSTOP",
+    "/vision": "EXPENSIVE_BACKSTOP",
+    "/asr/recognize": "EXPENSIVE_BACKSTOP",
+    "/asr/recognize-url": "EXPENSIVE_BACKSTOP",
+    "/asr/evaluate-pronunciation": "EXPENSIVE_BACKSTOP",
+    "/tts/synthesize": "EXPENSIVE_BACKSTOP",
+}
+
+if RATE_LIMIT_ENABLED:
+    # Redis 未配置时只使用进程内令牌桶
+    if os.getenv("REDIS_URL"):
+        init_cache(os.getenv("REDIS_URL"))
+    # 先于 CORS 注册，位于 CORS 内层，429 响应也会带上 CORS 头
+    if RATE_LIMIT_TRUSTED_PROXIES <= 0:
+        logger.warning("RATE_LIMIT_TRUSTED_PROXIES=0：按连接对端 IP 限流，网关位于反向代理之后时所有用户将共用一个限流桶")
+    app.add_middleware(
+        RateLimitMiddleware,
+        route_policies=GATEWAY_RATE_LIMIT_POLICIES,
+        read_policy="QUERY_BACKSTOP",
+        write_policy="WRITE_BACKSTOP",
+        exclude_paths=["/", "/health", "/gateway/metrics", "/docs", "/openapi.json", "/redoc"]
+    )
+
 # CORS 配置 - 允许所有前端域名
 app.add_middleware(
     CORSMiddleware,
@@ -56,6 +99,38 @@ SERVICE_URLS = {
     "asr": os.getenv("ASR_SERVICE_URL", "http://asr-service.zeabur.internal:8080"),
 }
 
+# 各服务的请求超时（秒）
+# vision 服务需要处理图像，设置60秒超时，其他服务保持30秒
+SERVICE_TIMEOUTS = {
+    "vision": 60.0,
+}
+DEFAULT_SERVICE_TIMEOUT = 30.0
+
+# 上游连接池配置（每个服务一个长连接客户端）
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "10"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+
+# 后台健康检查配置
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "3"))
+HEALTH_HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", "30"))
+# 连续探测失败多少次后判定服务 down（代理请求直接返回 503）
+HEALTH_DOWN_THRESHOLD = int(os.getenv("HEALTH_DOWN_THRESHOLD", "2"))
+
+# 熔断器配置
+# 连续失败（超时或连接错误）达到阈值后熔断，经过冷却时间后进入半开状态试探
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+
+# 重试预算：只重试幂等的 GET 请求，重试次数不超过请求数的一定比例
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "1"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MAX_TOKENS = float(os.getenv("RETRY_BUDGET_MAX_TOKENS", "10"))
+
 # 路由前缀映射
 ROUTE_PREFIXES = {
     "auth": ["/auth", "/register", "/login", "/refresh", "/me", "/user"],
@@ -70,28 +145,503 @@ ROUTE_PREFIXES = {
 PRESERVE_PREFIX_ROUTES = ["/user", "/photo", "/vocabulary", "/practice"]
 
 
+# 路由解析结果缓存大小（最近的 path -> (服务名, 转发路径)）
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "2048"))
+
+
+class _RouteNode:
+    """前缀树节点（按路径段分支）"""
+
+    __slots__ = ("children", "route")
+
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        # (服务名, 前缀, 是否保留前缀)
+        self.route: Optional[Tuple[str, str, bool]] = None
+
+
+class PrefixRouter:
+    """
+    预编译的前缀树路由器
+
+    启动时根据 ROUTE_PREFIXES 和 PRESERVE_PREFIX_ROUTES 构建一次，
+    按路径段逐级匹配，查找复杂度 O(路径长度)，采用最长前缀匹配。
+    最近的解析结果保存在 LRU 缓存中。
+    """
+
+    def __init__(
+        self,
+        route_prefixes: Dict[str, list],
+        preserve_prefixes: list,
+        default_service: str = "auth",
+        cache_size: int = ROUTE_CACHE_SIZE
+    ):
+        self.default_service = default_service
+        self._root = _RouteNode()
+        preserve = {p.lower() for p in preserve_prefixes}
+
+        for service, prefixes in route_prefixes.items():
+            for prefix in prefixes:
+                prefix = prefix.lower()
+                node = self._root
+                for segment in prefix.strip("/").split("/"):
+                    node = node.children.setdefault(segment, _RouteNode())
+                # 相同前缀出现多次时，保留第一次（与原先按字典顺序扫描一致）
+                if node.route is None:
+                    node.route = (service, prefix, prefix in preserve)
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, path: str) -> Tuple[str, str]:
+        """根据路径确定目标服务，返回 (服务名, 去掉前缀后的路径)"""
+        path = path.lower()
+        segments = path[1:].split("/") if path.startswith("/") else path.split("/")
+
+        node = self._root
+        matched = None
+        matched_depth = 0
+        for depth, segment in enumerate(segments, start=1):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.route is not None:
+                matched = node.route
+                matched_depth = depth
+
+        if matched is None:
+            # 默认返回 auth，保持原路径
+            return self.default_service, "/" + path
+
+        service, prefix, preserve = matched
+        if matched_depth == len(segments):
+            # 精确匹配前缀，返回根路径
+            return service, "/"
+        if preserve:
+            # 对于 /user 等前缀，保留完整路径
+            return service, path
+        # 路径以该前缀开头，去掉前缀
+        return service, path[len(prefix):]
+
+    def cache_info(self) -> Dict[str, int]:
+        """路由缓存统计"""
+        info = self.resolve.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+
+
+router = PrefixRouter(ROUTE_PREFIXES, PRESERVE_PREFIX_ROUTES)
+
+
 def determine_service(path: str) -> Tuple[str, str]:
     """根据路径确定目标服务，返回 (服务名, 去掉前缀后的路径)"""
-    path = path.lower()
-    original_path = path
-
-    # 精确匹配和前缀匹配
-    for service, prefixes in ROUTE_PREFIXES.items():
-        for prefix in prefixes:
-            if path == prefix:
-                # 精确匹配前缀，返回根路径
-                return service, "/"
-            elif path.startswith(prefix + "/"):
-                # 检查是否需要保留完整路径
-                if prefix in PRESERVE_PREFIX_ROUTES:
-                    # 对于 /user 等前缀，保留完整路径（path 已经以 / 开头）
-                    return service, path
-                else:
-                    # 路径以该前缀开头，去掉前缀
-                    return service, path[len(prefix):]
-
-    # 默认返回 auth，保持原路径
-    return "auth", "/" + original_path
+    return router.resolve(path)
+
+
+def _http2_supported() -> bool:
+    """检查是否安装了 HTTP/2 依赖（httpx[http2] -> h2）"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamPoolStats:
+    """单个服务连接池的运行指标"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests_total = 0
+        self.connections_opened = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, wait_seconds: float):
+        self.wait_time_total += wait_seconds
+        self.wait_time_max = max(self.wait_time_max, wait_seconds)
+
+
+class UpstreamPool:
+    """
+    上游服务连接池
+
+    为 SERVICE_URLS 中的每个服务维护一个长连接 httpx.AsyncClient，
+    复用 TCP 连接（keep-alive），避免每个请求都重新握手。
+    在应用启动时创建，关闭时释放。
+    """
+
+    def __init__(self, service_urls: Dict[str, str]):
+        self.service_urls = service_urls
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._stats: Dict[str, UpstreamPoolStats] = {
+            name: UpstreamPoolStats() for name in service_urls
+        }
+
+    async def start(self):
+        """为每个服务创建长连接客户端"""
+        http2 = UPSTREAM_HTTP2 and _http2_supported()
+        limits = httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+
+        for service_name, service_url in self.service_urls.items():
+            # 明文 HTTP 上游不支持 HTTP/2 协商（h2c），只对 https 上游启用
+            use_http2 = http2 and service_url.startswith("https://")
+            transport = httpx.AsyncHTTPTransport(limits=limits, http2=use_http2)
+            timeout = httpx.Timeout(
+                SERVICE_TIMEOUTS.get(service_name, DEFAULT_SERVICE_TIMEOUT),
+                pool=UPSTREAM_POOL_TIMEOUT,
+            )
+            self._transports[service_name] = transport
+            self._clients[service_name] = httpx.AsyncClient(
+                base_url=service_url,
+                transport=transport,
+                timeout=timeout,
+            )
+            logger.info(f"Upstream pool created: {service_name} -> {service_url} (http2={use_http2})")
+
+    async def close(self):
+        """关闭所有客户端，释放连接"""
+        for service_name, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close upstream pool {service_name}: {e}")
+        self._clients.clear()
+        self._transports.clear()
+
+    def get_client(self, service_name: str) -> httpx.AsyncClient:
+        """获取服务对应的长连接客户端"""
+        client = self._clients.get(service_name)
+        if client is None:
+            raise RuntimeError(f"Upstream pool for {service_name} is not started")
+        return client
+
+    async def send(
+        self,
+        service_name: str,
+        request: httpx.Request,
+        stream: bool = False
+    ) -> httpx.Response:
+        """
+        通过服务的连接池发送请求，并记录池指标
+
+        等待时间 = 发出请求到 httpcore 拿到连接开始工作（建连或写请求头）的时间
+        """
+        client = self.get_client(service_name)
+        stats = self._stats[service_name]
+        started = time.perf_counter()
+        waited = False
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal waited
+            if not waited:
+                waited = True
+                stats.record_wait(time.perf_counter() - started)
+            if event_name == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+
+        request.extensions["trace"] = trace
+        stats.in_flight += 1
+        stats.requests_total += 1
+        try:
+            return await client.send(request, stream=stream)
+        finally:
+            stats.in_flight -= 1
+
+    def _pool_connections(self, service_name: str) -> list:
+        """读取 httpcore 连接池中的连接列表"""
+        transport = self._transports.get(service_name)
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """每个服务的连接池指标（活跃/空闲连接、等待时间）"""
+        result = {}
+        for service_name, stats in self._stats.items():
+            connections = self._pool_connections(service_name)
+            idle = sum(1 for conn in connections if conn.is_idle())
+            result[service_name] = {
+                "active": len(connections) - idle,
+                "idle": idle,
+                "in_flight": stats.in_flight,
+                "requests_total": stats.requests_total,
+                "connections_opened": stats.connections_opened,
+                "wait_time_avg_ms": round(
+                    stats.wait_time_total / stats.requests_total * 1000, 3
+                ) if stats.requests_total else 0.0,
+                "wait_time_max_ms": round(stats.wait_time_max * 1000, 3),
+            }
+        return result
+
+
+# 全局上游连接池
+upstream_pool = UpstreamPool(SERVICE_URLS)
+
+
+class ServiceHealth:
+    """单个服务的健康状态和滚动探测历史"""
+
+    def __init__(self, url: str, history_size: int = HEALTH_HISTORY_SIZE):
+        self.url = url
+        self.status = "unknown"
+        self.error: Optional[str] = None
+        self.response_time: Optional[float] = None
+        self.last_checked: Optional[float] = None
+        self.consecutive_failures = 0
+        # (是否成功, 延迟秒数)
+        self.history: deque = deque(maxlen=history_size)
+
+    def record(self, status: str, response_time: Optional[float], error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.response_time = response_time
+        self.last_checked = time.time()
+        ok = status == "healthy"
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        self.history.append((ok, response_time))
+
+    @property
+    def is_down(self) -> bool:
+        """连续多次连接失败才判定为 down，避免单次抖动误判"""
+        return self.status == "down" and self.consecutive_failures >= HEALTH_DOWN_THRESHOLD
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = [latency for _, latency in self.history if latency is not None]
+        result = {
+            "status": self.status,
+            "url": self.url,
+            "response_time": self.response_time,
+            "last_checked": self.last_checked,
+            "consecutive_failures": self.consecutive_failures,
+            "availability": round(
+                sum(1 for ok, _ in self.history if ok) / len(self.history), 3
+            ) if self.history else None,
+            "avg_response_time": round(sum(latencies) / len(latencies), 4) if latencies else None,
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class HealthMonitor:
+    """
+    后台健康检查
+
+    按固定间隔并发探测所有后端服务（每个服务单独超时），
+    结果保存在内存中，/health 直接返回快照，代理也据此快速失败。
+    """
+
+    def __init__(self, pool: UpstreamPool, service_urls: Dict[str, str]):
+        self.pool = pool
+        self.services: Dict[str, ServiceHealth] = {
+            name: ServiceHealth(url) for name, url in service_urls.items()
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """启动后台探测任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台探测任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Health monitor error: {e}")
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    async def probe_all(self):
+        """并发探测所有服务"""
+        await asyncio.gather(*(self._probe(name) for name in self.services))
+
+    async def _probe(self, service_name: str):
+        health = self.services[service_name]
+        started = time.perf_counter()
+        try:
+            client = self.pool.get_client(service_name)
+            response = await client.get("/", timeout=HEALTH_CHECK_TIMEOUT)
+            health.record(
+                "healthy" if response.status_code == 200 else "unhealthy",
+                time.perf_counter() - started,
+            )
+        except Exception as e:
+            was_down = health.is_down
+            health.record("down", None, str(e) or type(e).__name__)
+            if health.is_down and not was_down:
+                logger.warning(f"Service {service_name} marked down: {health.error}")
+
+    def is_down(self, service_name: str) -> bool:
+        health = self.services.get(service_name)
+        return health is not None and health.is_down
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.snapshot() for name, health in self.services.items()}
+
+
+# 全局健康检查器
+health_monitor = HealthMonitor(upstream_pool, SERVICE_URLS)
+
+
+class CircuitBreaker:
+    """
+    单个服务的熔断器
+
+    状态:
+    - closed: 正常转发
+    - open: 熔断，直接返回 503，不再占用上游连接
+    - half_open: 冷却结束，放行少量试探请求，成功则恢复，失败则重新熔断
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.opened_at: Optional[float] = None
+        self._half_open_calls = 0
+        self._half_open_started: Optional[float] = None
+
+    def allow_request(self) -> bool:
+        """是否允许请求通过"""
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+        if self.state == self.HALF_OPEN:
+            # 试探请求长时间没有结果时（如网关内部异常），允许重新试探
+            if self._half_open_started and now - self._half_open_started >= self.reset_timeout:
+                self._half_open_calls = 0
+            if self._half_open_calls >= self.half_open_max_calls:
+                return False
+            self._half_open_calls += 1
+            self._half_open_started = now
+
+        return True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            logger.info("Circuit closed after successful probe")
+        self.state = self.CLOSED
+        self.opened_at = None
+        self._half_open_calls = 0
+        self._half_open_started = None
+
+    def record_failure(self, timeout: bool):
+        """记录一次失败（timeout=True 为超时，否则为连接/协议错误）"""
+        if timeout:
+            self.timeouts += 1
+        else:
+            self.errors += 1
+        self.consecutive_failures += 1
+
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._half_open_calls = 0
+            self._half_open_started = None
+
+    def retry_after(self) -> int:
+        """距离进入半开状态的剩余秒数"""
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0
+        return max(1, int(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "retry_after": self.retry_after(),
+        }
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶）
+
+    每个请求存入 ratio 个令牌，每次重试消耗 1 个，
+    保证重试流量不超过正常流量的固定比例，避免重试风暴。
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, max_tokens: float = RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.retries = 0
+        self.rejected = 0
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "tokens": round(self.tokens, 2),
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+
+
+# 每个服务一个熔断器和重试预算
+circuit_breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker() for name in SERVICE_URLS}
+retry_budgets: Dict[str, RetryBudget] = {name: RetryBudget() for name in SERVICE_URLS}
+
+
+@app.on_event("startup")
+async def startup_event():
+    """启动时创建上游连接池和后台健康检查"""
+    await upstream_pool.start()
+    await health_monitor.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭时停止健康检查并释放上游连接"""
+    await health_monitor.stop()
+    await upstream_pool.close()
 
 
 @app.get("/")
@@ -110,23 +660,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """检查所有后端服务的健康状态"""
-    results = {}
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        for service_name, service_url in SERVICE_URLS.items():
-            try:
-                response = await client.get(f"{service_url}/")
-                results[service_name] = {
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "url": service_url,
-                    "response_time": response.elapsed.total_seconds()
-                }
-            except Exception as e:
-                results[service_name] = {
-                    "status": "down",
-                    "url": service_url,
-                    "error": str(e)
-                }
+    """所有后端服务的健康状态（读取后台健康检查的内存快照）"""
+    results = health_monitor.snapshot()
+    for service_name, result in results.items():
+        result["circuit_breaker"] = circuit_breakers[service_name].snapshot()
+        result["retry_budget"] = retry_budgets[service_name].snapshot()
 
     return {
         "code": 0,
@@ -135,6 +673,75 @@ async def health_check():
     }
 
 
+@app.get("/gateway/metrics")
+async def gateway_metrics():
+    """网关上游连接池指标"""
+    return {
+        "code": 0,
+        "message": "success",
+        "data": {
+            "upstream_pools": upstream_pool.metrics(),
+            "route_cache": router.cache_info(),
+            "rate_limit": get_rate_limiter().local_stats()
+        }
+    }
+
+
+# 逐跳头（hop-by-hop），代理时不能转发
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+
+def _filter_headers(headers) -> list:
+    """去掉逐跳头，保留其余请求/响应头（支持重复头，如 set-cookie）"""
+    return [(k, v) for k, v in headers if k.lower() not in HOP_BY_HOP_HEADERS]
+
+
+def _forward_headers(request: Request) -> list:
+    """转发给上游的请求头：把客户端连接地址追加到 X-Forwarded-For，供上游按可信代理层数取客户端 IP"""
+    headers = [(k, v) for k, v in _filter_headers(request.headers.items()) if k.lower() != "x-forwarded-for"]
+    forwarded = ", ".join(request.headers.getlist("x-forwarded-for"))
+    peer = request.client.host if request.client else "unknown"
+    headers.append(("x-forwarded-for", f"{forwarded}, {peer}" if forwarded else peer))
+    return headers
+
+
+def _request_body_stream(request: Request):
+    """
+    返回请求体的流式迭代器，按块转发给上游（图片/音频上传不在网关缓冲）
+
+    没有请求体的请求（如 GET）返回 None，避免向上游发送 chunked 空请求体
+    """
+    if "content-length" not in request.headers and "transfer-encoding" not in request.headers:
+        return None
+    if request.headers.get("content-length") == "0":
+        return None
+    return request.stream()
+
+
+def _should_retry(
+    retryable: bool,
+    attempt: int,
+    breaker: CircuitBreaker,
+    retry_budget: RetryBudget
+) -> bool:
+    """判断失败的请求是否可以重试（幂等、未超过次数、熔断器未打开、预算充足）"""
+    if not retryable or attempt >= RETRY_MAX_ATTEMPTS:
+        return False
+    if breaker.state == CircuitBreaker.OPEN:
+        return False
+    return retry_budget.withdraw()
+
+
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"])
 async def proxy_request(path: str, request: Request):
     """
@@ -147,6 +754,8 @@ async def proxy_request(path: str, request: Request):
     - /generate, /sentences, /review, /progress -> practice service
     - /synthesize, /voices -> tts service
     - /asr/* -> asr service
+
+    请求体和响应体均以流式转发，网关不缓冲上传文件，也不改写上游响应格式
     """
     # 确定目标服务和转发路径
     service_name, proxy_path = determine_service("/" + path)
@@ -155,66 +764,105 @@ async def proxy_request(path: str, request: Request):
     if not service_url:
         raise HTTPException(status_code=503, detail=f"Service {service_name} not configured")
 
-    # 构建目标URL（使用去掉前缀后的路径）
-    target_url = f"{service_url}{proxy_path}"
-
-    logger.info(f"Proxying {request.method} /{path} -> {service_name} service ({proxy_path})")
-
-    try:
-        # vision 服务需要处理图像，设置60秒超时
-        # 其他服务保持30秒
-        timeout = 60.0 if service_name == "vision" else 30.0
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 转发请求
-            response = await client.request(
-                method=request.method,
-                url=target_url,
-                headers={k: v for k, v in request.headers.items() if k.lower() != "host"},
-                content=await request.body(),
-                params=request.query_params
-            )
-
-            # 尝试解析 JSON 响应
-            try:
-                response_data = response.json()
-            except (json.JSONDecodeError, ValueError):
-                # 如果响应不是有效的 JSON，返回错误响应
-                logger.warning(f"Non-JSON response from {service_name}: {response.text[:200]}")
-                response_data = {
-                    "code": -1,
-                    "message": f"{service_name} 服务返回了无效的响应格式",
-                    "data": None
-                }
-
-            # 返回响应
-            return JSONResponse(
-                content=response_data,
-                status_code=response.status_code,
-                headers=dict(response.headers)
-            )
-
-    except httpx.TimeoutException:
-        logger.error(f"Timeout proxying to {service_name} service")
+    # 服务已被健康检查判定为 down，直接返回 503，不再等待超时
+    if health_monitor.is_down(service_name):
+        logger.warning(f"Fast-failing request to down service {service_name}")
         return JSONResponse(
-            status_code=504,
+            status_code=503,
             content={
                 "code": -1,
-                "message": f"请求超时：{service_name} 服务响应时间过长",
+                "message": f"{service_name} 服务暂时不可用",
                 "data": None
-            }
+            },
+            headers={"Retry-After": str(int(HEALTH_CHECK_INTERVAL))}
         )
 
-    except httpx.HTTPError as e:
-        logger.error(f"HTTP error proxying to {service_name}: {e}")
+    # 熔断器打开时直接拒绝，不占用上游连接
+    breaker = circuit_breakers[service_name]
+    if not breaker.allow_request():
+        logger.warning(f"Circuit open for {service_name}, rejecting request")
         return JSONResponse(
-            status_code=502,
+            status_code=503,
             content={
                 "code": -1,
-                "message": f"无法连接到 {service_name} 服务",
-                "data": {"error": str(e)}
-            }
+                "message": f"{service_name} 服务暂时不可用（熔断中）",
+                "data": None
+            },
+            headers={"Retry-After": str(breaker.retry_after() or int(CIRCUIT_RESET_TIMEOUT))}
         )
 
+    # 构建目标URL（使用去掉前缀后的路径）
+    target_url = f"{service_url}{proxy_path}"
+
+    logger.info(f"Proxying {request.method} /{path} -> {service_name} service ({proxy_path})")
+
+    retry_budget = retry_budgets[service_name]
+    retry_budget.deposit()
+    body = _request_body_stream(request)
+    # 只有没有请求体的 GET 请求是幂等且可重放的
+    retryable = request.method == "GET" and body is None
+    attempt = 0
+
+    try:
+        while True:
+            try:
+                # 使用服务的长连接客户端转发请求（超时按服务配置）
+                client = upstream_pool.get_client(service_name)
+                upstream_request = client.build_request(
+                    method=request.method,
+                    url=target_url,
+                    headers=_forward_headers(request),
+                    content=body,
+                    params=request.query_params
+                )
+                response = await upstream_pool.send(service_name, upstream_request, stream=True)
+                breaker.record_success()
+
+                # 流式回传上游响应（保留原始 content-type / content-encoding，不做 JSON 重新序列化）
+                streaming_response = StreamingResponse(
+                    response.aiter_raw(),
+                    status_code=response.status_code,
+                    background=BackgroundTask(response.aclose)
+                )
+                # 直接设置原始响应头，保留重复头（如多个 set-cookie）
+                streaming_response.raw_headers = [
+                    (k.lower().encode("latin-1"), v.encode("latin-1"))
+                    for k, v in _filter_headers(response.headers.multi_items())
+                ]
+                return streaming_response
+
+            except httpx.TimeoutException:
+                breaker.record_failure(timeout=True)
+                if _should_retry(retryable, attempt, breaker, retry_budget):
+                    attempt += 1
+                    logger.warning(f"Timeout proxying to {service_name}, retrying ({attempt}/{RETRY_MAX_ATTEMPTS})")
+                    continue
+                logger.error(f"Timeout proxying to {service_name} service")
+                return JSONResponse(
+                    status_code=504,
+                    content={
+                        "code": -1,
+                        "message": f"请求超时：{service_name} 服务响应时间过长",
+                        "data": None
+                    }
+                )
+
+            except httpx.HTTPError as e:
+                breaker.record_failure(timeout=False)
+                if _should_retry(retryable, attempt, breaker, retry_budget):
+                    attempt += 1
+                    logger.warning(f"HTTP error proxying to {service_name}: {e}, retrying ({attempt}/{RETRY_MAX_ATTEMPTS})")
+                    continue
+                logger.error(f"HTTP error proxying to {service_name}: {e}")
+                return JSONResponse(
+                    status_code=502,
+                    content={
+                        "code": -1,
+                        "message": f"无法连接到 {service_name} 服务",
+                        "data": {"error": str(e)}
+                    }
+                )
+
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         return JSONResponse(
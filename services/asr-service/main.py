@@ -8,20 +8,20 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Optional
 import os
-import tempfile
 import logging
 import json
 
-from shared.database.models import User
 from shared.database.database import get_async_db
-from shared.utils.auth import get_current_user_optional
+from shared.utils.auth import Principal, get_current_principal_optional
 from shared.utils.response import success_response
-from shared.asr.recognizer import SpeechRecognizer
+from shared.utils.rate_limit import limit_expensive
+from shared.utils.http_client import start_http_clients, close_http_clients, http_clients
+from shared.asr.recognizer import SpeechRecognizer, RecognizerBusyError
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -88,6 +88,25 @@ async def startup_event():
 
     logger.info("=" * 60)
 
+    # 创建第三方 API 的长连接客户端
+    await start_http_clients()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭时释放第三方 API 连接和识别线程池"""
+    recognizer.close()
+    await close_http_clients()
+
+
+def _busy_exception(e: RecognizerBusyError) -> HTTPException:
+    """识别排队已满时快速返回 503"""
+    return HTTPException(
+        status_code=503,
+        detail="服务繁忙，请稍后重试",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 
 @app.get("/", tags=["Health"])
 async def root():
@@ -95,17 +114,31 @@ async def root():
     return success_response(data={"message": "ASR Service is running", "service": "asr"})
 
 
+@app.get("/health", tags=["Health"])
+async def health():
+    """健康检查 - 详细状态（识别线程池排队情况、第三方 API 连接池）"""
+    return {
+        "status": "ok",
+        "service": "asr",
+        "recognizer": recognizer.stats(),
+        "http_clients": http_clients.stats()
+    }
+
+
 @app.post("/recognize", tags=["ASR"])
+@limit_expensive(max_requests=30, window_seconds=60)  # 每 10 秒音频消耗 1 个配额
 async def recognize_audio(
+    request: Request,
     audio_file: UploadFile = File(...),
     language: str = "en-US",
-    engine: str = "groq-whisper",  # groq-whisper, openai-whisper, azure, baidu
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
+    engine: str = "auto",  # auto, groq-whisper, deepinfra, openai-whisper, azure, baidu
+    current_user: Annotated[Optional[Principal], Depends(get_current_principal_optional)] = None
 ):
     """
     语音识别 - 将音频转换为文本
 
     支持的引擎：
+    - auto: 自动选择（默认，按各引擎最近的延迟和错误率选择，失败时自动切换）
     - groq-whisper: Groq Whisper API（推荐，超高速，有免费额度）
     - deepinfra: DeepInfra Whisper API（高速，有免费额度）
     - openai-whisper: OpenAI Whisper API（准确度高，需要付费）
@@ -115,7 +148,7 @@ async def recognize_audio(
     参数：
     - audio_file: 音频文件（支持 mp3, wav, m4a, ogg 等格式）
     - language: 语言代码（默认 en-US）
-    - engine: 识别引擎（默认 groq-whisper）
+    - engine: 识别引擎（默认 auto；指定引擎时优先使用，失败或已降级时自动切换）
     """
     try:
         # 验证文件类型
@@ -130,15 +163,18 @@ async def recognize_audio(
 
         logger.info(f"Processing audio file: {audio_file.filename}, size: {len(audio_data)} bytes")
 
-        # 调用语音识别
+        # 调用语音识别（缓存未命中时本地预处理：单声道 16 kHz、裁掉首尾静音，减小上传体积）
         result = await recognizer.recognize(
             audio_data=audio_data,
             language=language,
-            engine=engine
+            engine=engine,
+            preprocess=True
         )
 
         return success_response(data=result)
 
+    except RecognizerBusyError as e:
+        raise _busy_exception(e)
     except Exception as e:
         logger.error(f"Error processing audio: {str(e)}")
         raise HTTPException(
@@ -151,8 +187,8 @@ async def recognize_audio(
 async def recognize_audio_url(
     audio_url: str = Form(...),
     language: str = Form("en-US"),
-    engine: str = Form("groq-whisper"),
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
+    engine: str = Form("auto"),
+    current_user: Annotated[Optional[Principal], Depends(get_current_principal_optional)] = None
 ):
     """
     语音识别 - 通过 URL 识别音频
@@ -170,6 +206,8 @@ async def recognize_audio_url(
 
         return success_response(data=result)
 
+    except RecognizerBusyError as e:
+        raise _busy_exception(e)
     except Exception as e:
         logger.error(f"Error recognizing audio from URL: {str(e)}")
         raise HTTPException(
@@ -179,11 +217,13 @@ async def recognize_audio_url(
 
 
 @app.post("/evaluate-pronunciation", tags=["ASR"])
+@limit_expensive(max_requests=30, window_seconds=60)  # 每 10 秒音频消耗 1 个配额
 async def evaluate_pronunciation(
+    request: Request,
     audio_file: UploadFile = File(...),
     target_text: str = Form(...),
     language: str = Form("en-US"),
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
+    current_user: Annotated[Optional[Principal], Depends(get_current_principal_optional)] = None
 ):
     """
     发音评分 - 对比用户录音和目标文本，给出评分
@@ -200,11 +240,12 @@ async def evaluate_pronunciation(
         # 读取音频文件
         audio_data = await audio_file.read()
 
-        # 语音识别
+        # 语音识别（缓存未命中时先在本地预处理）
         recognition_result = await recognizer.recognize(
             audio_data=audio_data,
             language=language,
-            engine="groq-whisper"
+            engine="auto",
+            preprocess=True
         )
 
         recorded_text = recognition_result.get("text", "")
@@ -222,9 +263,12 @@ async def evaluate_pronunciation(
         return success_response(data={
             "recorded_text": recorded_text,
             "target_text": target_text,
-            "score": score
+            "score": score,
+            "preprocess": recognition_result.get("preprocess")
         })
 
+    except RecognizerBusyError as e:
+        raise _busy_exception(e)
     except Exception as e:
         logger.error(f"Error evaluating pronunciation: {str(e)}")
         raise HTTPException(
@@ -235,7 +279,7 @@ async def evaluate_pronunciation(
 
 @app.get("/engines", tags=["ASR"])
 async def list_engines(
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
+    current_user: Annotated[Optional[Principal], Depends(get_current_principal_optional)] = None
 ):
     """
     获取支持的语音识别引擎列表
@@ -246,15 +290,15 @@ async def list_engines(
 
 @app.get("/config", tags=["ASR"])
 async def get_config(
-    current_user: Annotated[Optional[User], Depends(get_current_user_optional)] = None
+    current_user: Annotated[Optional[Principal], Depends(get_current_principal_optional)] = None
 ):
     """
     获取 ASR 服务配置信息
     """
     return success_response(data={
         "supported_languages": ["en-US", "en-GB", "zh-CN"],
-        "supported_engines": ["groq-whisper", "deepinfra", "openai-whisper", "azure", "baidu"],
-        "default_engine": "groq-whisper",
+        "supported_engines": ["auto", "groq-whisper", "deepinfra", "openai-whisper", "azure", "baidu"],
+        "default_engine": "auto",
         "default_language": "en-US",
         "max_audio_size": 25 * 1024 * 1024,  # 25MB
         "supported_formats": ["mp3", "wav", "m4a", "ogg", "flac"]
@@ -7,18 +7,27 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径（支持 Zeabur 部署）
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from typing import Annotated, Optional
 import os
+import uuid
 
-from shared.database.models import User, UserCreate, UserLogin, UserResponse, Token
+from shared.database.models import User, UserCreate, UserLogin, UserResponse, Token, utc_now
 from shared.database.database import get_async_db
-from shared.utils.auth import hash_password, verify_password, create_access_token, get_current_user
+from shared.utils.auth import (
+    hash_password_async, verify_password_async, password_hasher,
+    create_access_token, get_current_user, get_current_user_snapshot, invalidate_user_snapshot,
+    anonymous_login_cache_key, invalidate_anonymous_login
+)
 from shared.utils.response import success_response
+from shared.utils.cache import get_cache
+from shared.storage.avatar import AvatarError, get_avatar_store, is_inline_avatar
 from shared.utils.rate_limit import limit_auth
 
 # 初始化 FastAPI 应用
@@ -48,6 +57,11 @@ app.add_middleware(
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))  # 默认 7 天 (7*24*60=10080)
+# 匿名登录结果缓存时间（秒），不超过 token 有效期的一半，保证返回的 token 仍有足够的剩余有效期
+ANONYMOUS_LOGIN_CACHE_TTL = min(
+    int(os.getenv("ANONYMOUS_LOGIN_CACHE_TTL", "3600")),
+    ACCESS_TOKEN_EXPIRE_MINUTES * 60 // 2
+)
 
 
 @app.get("/", tags=["Health"])
@@ -59,7 +73,7 @@ async def root():
 @app.get("/health", tags=["Health"])
 async def health():
     """健康检查 - 详细状态"""
-    return {"status": "ok", "service": "auth"}
+    return {"status": "ok", "service": "auth", "password_hash": password_hasher.stats()}
 
 
 @app.get("/health/db", tags=["Health"])
@@ -104,6 +118,55 @@ async def check_database(db: AsyncSession = Depends(get_async_db)):
         }
 
 
+async def _upsert_anonymous_user(db: AsyncSession, device_id: str) -> User:
+    """
+    按设备ID查找或创建匿名用户
+
+    PostgreSQL 使用单条 INSERT ... ON CONFLICT (device_id) DO UPDATE ... RETURNING，
+    并发的首次启动不会触发唯一约束错误；其他数据库退回先查询后插入
+    """
+    unique_id = str(uuid.uuid4())[:8]
+    username = f"anonymous_{unique_id}"
+    values = dict(
+        username=username,
+        email=f"{username}@anonymous.local",
+        nickname=f"用户{unique_id}",
+        device_id=device_id,
+        is_anonymous=1,
+        password_hash=None  # 匿名用户没有密码
+    )
+
+    if db.bind.dialect.name == "postgresql":
+        now = utc_now()
+        stmt = pg_insert(User).values(**values, created_at=now, updated_at=now)
+        # 冲突时只更新 updated_at（最近登录时间），RETURNING 返回已有用户
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.device_id],
+            set_={"updated_at": stmt.excluded.updated_at}
+        ).returning(User)
+        result = await db.execute(stmt, execution_options={"populate_existing": True})
+        user = result.scalar_one()
+        await db.commit()
+        return user
+
+    result = await db.execute(select(User).where(User.device_id == device_id))
+    user = result.scalar_one_or_none()
+    if user:
+        return user
+
+    user = User(**values)
+    db.add(user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 同一设备的并发请求已经创建了用户
+        await db.rollback()
+        result = await db.execute(select(User).where(User.device_id == device_id))
+        return result.scalar_one()
+    await db.refresh(user)
+    return user
+
+
 @app.post("/anonymous-login", tags=["Auth"])
 async def anonymous_login(
     request_data: dict,
@@ -115,12 +178,11 @@ async def anonymous_login(
     - **deviceId**: 设备唯一标识符
 
     流程：
-    1. 检查设备ID是否已存在用户
-    2. 如果存在，返回该用户的token
-    3. 如果不存在，创建新的匿名用户
+    1. 缓存中有该设备的有效 token 时直接返回（不访问数据库）
+    2. 否则用一条 upsert 语句查找或创建匿名用户
+    3. 签发 token 并缓存一段时间（短于 token 有效期）
     """
     import logging
-    import uuid
     import traceback
     logger = logging.getLogger(__name__)
 
@@ -137,50 +199,33 @@ async def anonymous_login(
 
         logger.info(f"匿名登录请求: device_id={device_id}")
 
-        # 查找是否已存在该设备的用户
-        result = await db.execute(select(User).where(User.device_id == device_id))
-        user = result.scalar_one_or_none()
-
-        # 如果不存在，创建新的匿名用户
-        if not user:
-            try:
-                # 生成唯一的用户名和邮箱
-                unique_id = str(uuid.uuid4())[:8]
-                username = f"anonymous_{unique_id}"
-                email = f"{username}@anonymous.local"
-
-                logger.info(f"创建新匿名用户: username={username}, device_id={device_id}")
-
-                # 创建匿名用户
-                new_user = User(
-                    username=username,
-                    email=email,
-                    nickname=f"用户{unique_id}",
-                    device_id=device_id,
-                    is_anonymous=1,
-                    password_hash=None  # 匿名用户没有密码
-                )
-                db.add(new_user)
-                await db.commit()
-                await db.refresh(new_user)
-
-                logger.info(f"新匿名用户创建成功: user_id={new_user.user_id}")
-                user = new_user
-            except Exception as e:
-                logger.error(f"创建匿名用户失败: {str(e)}")
-                logger.error(traceback.format_exc())
-                await db.rollback()
-                return success_response(
-                    code=-1,
-                    message=f"创建用户失败: {str(e)}",
-                    data=None
-                )
-        else:
-            logger.info(f"匿名用户登录: username={user.username}, device_id={device_id}")
+        cache = get_cache()
+        cache_key = anonymous_login_cache_key(device_id)
+        if cache:
+            cached_login = await cache.get(cache_key)
+            if cached_login:
+                logger.info(f"匿名登录命中缓存: user_id={cached_login['user']['user_id']}")
+                return success_response(data=cached_login)
+
+        try:
+            user = await _upsert_anonymous_user(db, device_id)
+        except Exception as e:
+            logger.error(f"创建匿名用户失败: {str(e)}")
+            logger.error(traceback.format_exc())
+            await db.rollback()
+            return success_response(
+                code=-1,
+                message=f"创建用户失败: {str(e)}",
+                data=None
+            )
 
         # 生成 JWT Token
         access_token = create_access_token(
-            data={"sub": str(user.user_id), "username": user.username},
+            data={
+                "sub": str(user.user_id),
+                "username": user.username,
+                "is_anonymous": bool(user.is_anonymous)
+            },
             secret_key=SECRET_KEY,
             algorithm=ALGORITHM,
             expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -188,11 +233,15 @@ async def anonymous_login(
 
         logger.info(f"匿名登录成功: user_id={user.user_id}, username={user.username}")
 
-        return success_response(data={
+        login_data = {
             "access_token": access_token,
             "token_type": "bearer",
-            "user": UserResponse.model_validate(user).model_dump()
-        })
+            "user": UserResponse.model_validate(user).model_dump(mode="json")
+        }
+        if cache:
+            await cache.set(cache_key, login_data, ANONYMOUS_LOGIN_CACHE_TTL)
+
+        return success_response(data=login_data)
 
     except Exception as e:
         logger.error(f"匿名登录异常: {str(e)}")
@@ -333,7 +382,7 @@ async def register(
         username=username,
         email=email,
         nickname=username,
-        password_hash=hash_password(password)
+        password_hash=await hash_password_async(password)
     )
     db.add(new_user)
     await db.commit()
@@ -341,7 +390,11 @@ async def register(
 
     # 生成 JWT Token
     access_token = create_access_token(
-        data={"sub": str(new_user.user_id), "username": new_user.username},
+        data={
+            "sub": str(new_user.user_id),
+            "username": new_user.username,
+            "is_anonymous": bool(new_user.is_anonymous)
+        },
         secret_key=SECRET_KEY,
         algorithm=ALGORITHM,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -375,7 +428,7 @@ async def login(
     user = result.scalar_one_or_none()
 
     # 验证用户和密码
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await verify_password_async(user_data.password, user.password_hash):
         return success_response(
             code=-1,
             message="用户名或密码错误",
@@ -384,7 +437,11 @@ async def login(
 
     # 生成 JWT Token
     access_token = create_access_token(
-        data={"sub": str(user.user_id), "username": user.username},
+        data={
+            "sub": str(user.user_id),
+            "username": user.username,
+            "is_anonymous": bool(user.is_anonymous)
+        },
         secret_key=SECRET_KEY,
         algorithm=ALGORITHM,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -399,7 +456,7 @@ async def login(
 
 @app.get("/me", tags=["Auth"])
 async def get_current_user_info(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user_snapshot)]
 ):
     """
     获取当前用户信息
@@ -411,7 +468,7 @@ async def get_current_user_info(
 
 @app.post("/refresh", tags=["Auth"])
 async def refresh_token(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user_snapshot)]
 ):
     """
     刷新 Token
@@ -419,7 +476,11 @@ async def refresh_token(
     需要在 Header 中提供有效的 Token
     """
     access_token = create_access_token(
-        data={"sub": str(current_user.user_id), "username": current_user.username},
+        data={
+            "sub": str(current_user.user_id),
+            "username": current_user.username,
+            "is_anonymous": bool(current_user.is_anonymous)
+        },
         secret_key=SECRET_KEY,
         algorithm=ALGORITHM,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -489,9 +550,10 @@ async def reset_password(
         )
 
     # 更新密码
-    user.password_hash = hash_password(new_password)
+    user.password_hash = await hash_password_async(new_password)
     await db.commit()
     await db.refresh(user)
+    await invalidate_user_snapshot(user.user_id)
 
     logger.info(f"密码重置成功: {email_or_phone}")
 
@@ -524,7 +586,7 @@ async def logout():
 # 用户相关端点
 @app.get("/user/me", tags=["User"])
 async def get_user_me(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user_snapshot)]
 ):
     """
     获取当前用户信息
@@ -537,7 +599,7 @@ async def get_user_me(
 @app.patch("/user/preferences", tags=["User"])
 async def update_user_preferences(
     request_data: dict,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_current_user_snapshot)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -586,10 +648,21 @@ async def update_user_profile(
     if nickname:
         current_user.nickname = nickname
     if avatar:
+        # base64 头像保存到对象存储，users 表只保存短 URL
+        if is_inline_avatar(avatar):
+            try:
+                avatar = await get_avatar_store().save_inline(avatar)
+            except AvatarError as e:
+                return success_response(code=-1, message=str(e), data=None)
+            except RuntimeError as e:
+                # 未配置持久化存储时按原方式把 base64 头像保存在 users 表中，不影响头像上传
+                logger.warning(f"头像存储未配置，头像按 base64 保存到数据库: {e}")
         current_user.avatar_url = avatar
 
     try:
         await db.commit()
+        await invalidate_user_snapshot(current_user.user_id)
+        await invalidate_anonymous_login(current_user.device_id)
         logger.info(f"数据库提交成功: user_id={current_user.user_id}")
     except Exception as e:
         logger.error(f"数据库提交失败: {e}", exc_info=True)
@@ -630,6 +703,37 @@ async def update_user_profile(
     return success_response(data=result_data)
 
 
+@app.get("/user/avatar/{digest}", tags=["User"])
+async def get_avatar(digest: str, request: Request, size: Optional[int] = None):
+    """
+    获取头像图片
+
+    头像按内容哈希寻址，内容不会变化，可以被浏览器和 CDN 永久缓存
+
+    - **digest**: 头像内容哈希
+    - **size**: 缩略图边长（如 64、256），不传返回原图
+    """
+    etag = f'"{digest}-{size or "original"}"'
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+    try:
+        avatar = await get_avatar_store().load(digest, size)
+    except RuntimeError as e:
+        import logging
+        logging.getLogger(__name__).error(f"头像存储未正确配置: {e}")
+        raise HTTPException(status_code=503, detail="头像存储不可用")
+    if avatar is None:
+        raise HTTPException(status_code=404, detail="头像不存在")
+
+    data, content_type = avatar
+    return Response(content=data, media_type=content_type, headers=cache_headers)
+
+
 @app.post("/user/change-password", tags=["User"])
 async def change_password(
     request_data: dict,
@@ -656,7 +760,7 @@ async def change_password(
         )
 
     # 验证当前密码
-    if not verify_password(current_password, current_user.password_hash):
+    if not await verify_password_async(current_password, current_user.password_hash):
         return success_response(
             code=-1,
             message="当前密码错误",
@@ -673,8 +777,9 @@ async def change_password(
         )
 
     # 更新密码
-    current_user.password_hash = hash_password(new_password)
+    current_user.password_hash = await hash_password_async(new_password)
     await db.commit()
+    await invalidate_user_snapshot(current_user.user_id)
 
     logger.info(f"用户修改密码: {current_user.username}")
 
@@ -728,6 +833,8 @@ async def clear_user_by_email(
         delete(User).where(User.email == email)
     )
     await db.commit()
+    await invalidate_user_snapshot(user.user_id)
+    await invalidate_anonymous_login(user.device_id)
 
     logger.warning(f"[开发端点] 已删除用户: {email} (user_id: {user.user_id})")
 
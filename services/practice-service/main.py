@@ -15,16 +15,17 @@ from typing import Annotated, List, Optional
 from datetime import datetime
 
 from shared.database.models import (
-    User, Scene, SceneSentence, ReviewRecord, Word,
+    Scene, SceneSentence, ReviewRecord, Word,
     SceneSentenceCreate, SceneSentenceResponse, ReviewRecordResponse
 )
 from shared.database.database import get_async_db
-from shared.utils.auth import get_current_user
+from shared.utils.auth import Principal, get_current_principal
 from shared.utils.response import success_response
 from shared.vision.scene_understanding import SceneUnderstanding
 from shared.word.review import (
     get_due_reviews, submit_review_result, get_review_progress
 )
+from shared.word.word_cache import get_words_by_ids
 
 # 初始化 FastAPI 应用
 app = FastAPI(
@@ -62,7 +63,7 @@ async def root():
 @app.post("/practice/generate", response_model=SceneSentenceResponse, tags=["Practice"])
 async def generate_sentence(
     scene_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db),
     difficulty: str = Query("beginner", description="难度: beginner, intermediate, advanced")
 ):
@@ -127,7 +128,7 @@ async def generate_sentence(
 @app.get("/practice/sentences/{scene_id}", response_model=List[SceneSentenceResponse], tags=["Practice"])
 async def get_scene_sentences(
     scene_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -163,7 +164,7 @@ async def get_scene_sentences(
 
 @app.get("/practice/review", response_model=List[ReviewRecordResponse], tags=["Practice"])
 async def get_review_list(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db),
     limit: int = Query(20, ge=1, le=100, description="返回数量")
 ):
@@ -181,10 +182,11 @@ async def get_review_list(
         records = await get_due_reviews(db, current_user.user_id, limit)
         logger.info(f"找到 {len(records)} 条待复习记录")
 
-        # 加载单词信息
+        # 批量加载单词信息（一次 Redis 往返，未命中的一次 SQL 补齐，避免逐条 refresh）
+        words = await get_words_by_ids(db, [record.word_id for record in records])
+
         response = []
         for record in records:
-            await db.refresh(record, ["word"])
             response.append(ReviewRecordResponse(
                 record_id=record.record_id,
                 user_id=record.user_id,
@@ -193,7 +195,7 @@ async def get_review_list(
                 next_review_time=record.next_review_time,
                 total_correct=record.total_correct,
                 total_wrong=record.total_wrong,
-                word=record.word
+                word=words.get(record.word_id)
             ))
 
         return response
@@ -209,7 +211,7 @@ async def get_review_list(
 async def submit_review(
     word_id: int,
     is_correct: bool,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -231,7 +233,7 @@ async def submit_review(
 
 @app.get("/practice/progress", tags=["Practice"])
 async def get_progress(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -6,7 +6,7 @@ import sys
 from pathlib import Path
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi import FastAPI, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any
 import base64
@@ -18,6 +18,7 @@ from datetime import datetime
 from openai import AsyncOpenAI
 import httpx
 from shared.utils.response import success_response
+from shared.utils.rate_limit import limit_expensive
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -67,7 +68,8 @@ async def root():
         "model": "google/gemma-3-12b-it"
     })  
 @app.post("/photo/recognize", tags=["Vision"])
-async def recognize_photo(file: UploadFile = UploadFile(...)):
+@limit_expensive(max_requests=30, window_seconds=60)
+async def recognize_photo(request: Request, file: UploadFile = UploadFile(...)):
     """
     拍照识别单词（使用 DeepInfra Gemma 3 Vision）
     - **file**: 上传的图片文件
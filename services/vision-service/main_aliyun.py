@@ -8,7 +8,7 @@ from pathlib import Path
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
@@ -74,7 +74,7 @@ async def root():
 
 @app.post("/photo/recognize", tags=["Vision"])
 @limit_expensive(max_requests=30, window_seconds=60)
-async def recognize_photo(file: UploadFile = UploadFile(...)):
+async def recognize_photo(request: Request, file: UploadFile = UploadFile(...)):
     """
     拍照识别单词（使用阿里云）
 
@@ -85,7 +85,7 @@ async def recognize_photo(file: UploadFile = UploadFile(...)):
     - 场景描述（英文句子）
     - 场景翻译（中文翻译）
 
-    限流：每个用户/IP 每分钟最多 30 次
+    限流：每个用户/IP 每分钟 30 个配额，每 2 百万像素（或 1 MB）消耗 1 个配额
     """
     try:
         # 读取图片数据
@@ -20,10 +20,12 @@ from shared.database.models import (
     WordCreate, UserWordCreate, Tag as TagModel, ReviewRecord
 )
 from shared.database.database import get_async_db
-from shared.utils.auth import get_current_user
+from shared.utils.auth import Principal, get_current_principal
 from shared.utils.response import success_response
-from shared.utils.cache import cached, CachePolicy
+from shared.utils.cache import cached, get_cache, CachePolicy
+from shared.utils.http_client import start_http_clients, close_http_clients
 from shared.word.dictionary import DictionaryAPI
+from shared.word.word_cache import get_words_by_ids, invalidate_words, word_lookup_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -54,6 +56,18 @@ app.add_middleware(
 dictionary = DictionaryAPI()
 
 
+@app.on_event("startup")
+async def startup_event():
+    """启动时创建词典 API 的长连接客户端"""
+    await start_http_clients()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """关闭时释放词典 API 连接"""
+    await close_http_clients()
+
+
 @app.get("/", tags=["Health"])
 async def root():
     """健康检查"""
@@ -95,9 +109,18 @@ async def lookup_word(
 
     - **english_word**: 英文单词
 
-    使用缓存策略：单词查询结果缓存 24 小时
+    使用缓存策略：单词查询结果缓存 24 小时（热门单词直接从进程内 L1 缓存返回）
     """
-    # 先查数据库
+    cache = get_cache()
+    cache_key = word_lookup_cache_key(english_word)
+
+    # 先查缓存
+    if cache:
+        cached_word = await cache.get(cache_key)
+        if cached_word:
+            return WordResponse.model_validate(cached_word)
+
+    # 再查数据库
     result = await db.execute(
         select(Word).where(Word.english_word == english_word.lower())
     )
@@ -105,7 +128,10 @@ async def lookup_word(
 
     if word:
         logger.info(f"单词从数据库获取: {english_word}")
-        return WordResponse.model_validate(word)
+        word_response = WordResponse.model_validate(word)
+        if cache:
+            await cache.set(cache_key, word_response.model_dump(mode="json"), CachePolicy.WORD_LOOKUP_TTL)
+        return word_response
 
     # 从词典 API 获取
     logger.info(f"从词典 API 获取单词: {english_word}")
@@ -124,11 +150,8 @@ async def lookup_word(
 
     # 尝试缓存到 Redis
     try:
-        from shared.utils.cache import get_cache
-        cache = get_cache()
-        if cache and await cache.is_available():
-            cache_key = f"word_lookup:{english_word.lower()}"
-            await cache.set(cache_key, WordResponse.model_validate(new_word).model_dump(), CachePolicy.WORD_LOOKUP_TTL)
+        if cache:
+            await cache.set(cache_key, WordResponse.model_validate(new_word).model_dump(mode="json"), CachePolicy.WORD_LOOKUP_TTL)
             logger.info(f"单词已缓存: {english_word}")
     except Exception as e:
         logger.warning(f"缓存单词失败: {e}")
@@ -155,11 +178,10 @@ async def get_tags(
 
     使用缓存策略：标签列表缓存 24 小时
     """
-    # 尝试从缓存获取
+    # 尝试从缓存获取（L1 命中时不访问 Redis）
     try:
-        from shared.utils.cache import get_cache
         cache = get_cache()
-        if cache and await cache.is_available():
+        if cache:
             cache_key = "tags_list"
             cached_tags = await cache.get(cache_key)
             if cached_tags:
@@ -184,7 +206,7 @@ async def get_tags(
     # 缓存结果
     try:
         cache = get_cache()
-        if cache and await cache.is_available():
+        if cache:
             await cache.set("tags_list", tags_list, CachePolicy.TAGS_LIST_TTL)
             logger.info("标签列表已缓存")
     except Exception as e:
@@ -195,7 +217,7 @@ async def get_tags(
 
 @app.get("/list", response_model=List[UserWordResponse], tags=["Words"])
 async def get_word_list(
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db),
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
@@ -210,13 +232,13 @@ async def get_word_list(
     - **tag_id**: 按标签筛选（可选）
     - **search**: 搜索单词（可选，支持英文或中文模糊搜索）
 
-    性能优化：使用JOIN一次性获取所有关联数据，避免N+1查询
+    性能优化：使用JOIN一次性获取所有关联数据，避免N+1查询；
+    单词详情通过批量缓存读取，一页最多一次 Redis 往返
     """
     # 使用 joinedload 一次性加载关联数据
     from sqlalchemy.orm import selectinload
 
     query = select(UserWord).options(
-        selectinload(UserWord.word),
         selectinload(UserWord.tag)
     ).where(UserWord.user_id == current_user.user_id)
 
@@ -237,8 +259,11 @@ async def get_word_list(
     result = await db.execute(query)
     user_words = result.scalars().all()
 
-    # 批量获取复习记录（一次性查询，避免N+1）
+    # 批量获取单词详情（一次 Redis 往返，未命中的一次 SQL 补齐）
     word_ids = [uw.word_id for uw in user_words]
+    words = await get_words_by_ids(db, word_ids)
+
+    # 批量获取复习记录（一次性查询，避免N+1）
     review_records = {}
     if word_ids:
         review_result = await db.execute(
@@ -267,7 +292,7 @@ async def get_word_list(
             scene_id=uw.scene_id,
             tag_id=uw.tag_id,
             created_at=uw.created_at,
-            word=WordResponse.model_validate(uw.word) if uw.word else None,
+            word=words.get(uw.word_id),
             tag={"tag_id": uw.tag.tag_id, "tag_name": uw.tag.tag_name, "color": uw.tag.color} if uw.tag else None,
             total_correct=total_correct,
             total_wrong=total_wrong,
@@ -281,7 +306,7 @@ async def get_word_list(
 @app.post("/save-with-vision-data", response_model=UserWordResponse, tags=["Words"])
 async def save_word_with_vision_data(
     word_data: dict,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -321,6 +346,8 @@ async def save_word_with_vision_data(
         select(Word).where(Word.english_word == word_text.lower())
     )
     word = word_result.scalar_one_or_none()
+    # 新建或更新的单词，提交后清除其缓存
+    changed_word = None
 
     if not word:
         # 使用vision数据创建新单词（不调用外部API）
@@ -335,6 +362,7 @@ async def save_word_with_vision_data(
         db.add(new_word)
         await db.flush()  # 获取word_id，但不提交
         word = new_word
+        changed_word = word
         logger.info(f"✅ 创建新单词: {word_text} (使用vision数据)")
     else:
         # 如果数据库中的单词信息不完整，更新它
@@ -347,6 +375,7 @@ async def save_word_with_vision_data(
             word.phonetic_uk = phonetic
             updated = True
         if updated:
+            changed_word = word
             logger.info(f"✅ 更新单词信息: {word_text}")
 
     # Step 2: 检查是否已存在
@@ -396,6 +425,9 @@ async def save_word_with_vision_data(
 
     # Step 5: 一次性提交所有更改
     await db.commit()
+    # 提交后再清除缓存，避免并发请求在提交前把旧数据重新写回缓存
+    if changed_word is not None:
+        await invalidate_words(changed_word)
 
     # Step 6: 刷新关联数据
     await db.refresh(new_user_word, ["word", "tag"])
@@ -421,7 +453,7 @@ async def save_word_with_vision_data(
 @app.post("/add", response_model=UserWordResponse, tags=["Words"])
 async def add_word(
     word_data: UserWordCreate,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -456,6 +488,7 @@ async def add_word(
         )
 
     # 如果提供了单词详情，更新数据库中的单词记录
+    updated_word = None
     if word_data.chinese_meaning or word_data.phonetic_us:
         try:
             word_result = await db.execute(select(Word).where(Word.word_id == word_data.word_id))
@@ -473,6 +506,7 @@ async def add_word(
                     word.example_sentence = word_data.example_sentence
                 if word_data.example_translation:
                     word.example_translation = word_data.example_translation
+                updated_word = word
                 logger.info(f"✅ Updated word {word.word_id} with vision-service data")
         except Exception as e:
             logger.warning(f"Failed to update word details (non-critical): {e}")
@@ -496,6 +530,9 @@ async def add_word(
 
     # 一次性提交所有更改（单词更新、生词记录、复习记录）
     await db.commit()
+    # 提交后再清除缓存，避免并发请求在提交前把旧数据重新写回缓存
+    if updated_word is not None:
+        await invalidate_words(updated_word)
 
     # 刷新以获取生成的ID和关联数据
     await db.refresh(new_user_word, ["word", "tag"])
@@ -518,7 +555,7 @@ async def add_word(
 @app.get("/{user_word_id}", response_model=UserWordResponse, tags=["Words"])
 async def get_word_detail(
     user_word_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -592,7 +629,7 @@ async def get_word_detail(
 async def update_word_tag(
     word_id: int,
     tag_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
@@ -626,7 +663,7 @@ async def update_word_tag(
 @app.delete("/{word_id}", response_model=dict, tags=["Words"])
 async def delete_word(
     word_id: int,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
     db: AsyncSession = Depends(get_async_db)
 ):
     """
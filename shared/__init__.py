@@ -7,6 +7,7 @@ Photo English Learn - 共享模块
 - tts: 语音合成
 - vision: 视觉AI
 - word: 单词和复习系统
+- storage: 对象存储（用户头像）
 """
 
 __version__ = "1.0.0"
@@ -0,0 +1,275 @@
+"""
+音频预处理
+上传识别 API 前在本地解码、转单声道、重采样到 16 kHz、裁掉首尾静音并重新编码，
+减少上传体积和识别耗时（Whisper 内部同样按 16 kHz 单声道处理，不影响识别效果）
+"""
+import io
+import os
+import wave
+import shutil
+import asyncio
+import logging
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖：未安装 NumPy 时跳过预处理，按原始音频上传
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于部署环境
+    np = None
+
+# 是否启用预处理
+ASR_PREPROCESS_ENABLED = os.getenv("ASR_PREPROCESS_ENABLED", "true").lower() == "true"
+# 目标采样率
+ASR_PREPROCESS_SAMPLE_RATE = int(os.getenv("ASR_PREPROCESS_SAMPLE_RATE", "16000"))
+# 输出格式：auto（有 ffmpeg 时用 ogg/opus，否则 wav）、ogg、flac、wav
+ASR_PREPROCESS_FORMAT = os.getenv("ASR_PREPROCESS_FORMAT", "auto")
+# ogg/opus 码率
+ASR_PREPROCESS_OPUS_BITRATE = os.getenv("ASR_PREPROCESS_OPUS_BITRATE", "24k")
+# ffmpeg 单次解码/编码超时（秒）
+ASR_PREPROCESS_TIMEOUT = float(os.getenv("ASR_PREPROCESS_TIMEOUT", "10"))
+# 能量 VAD：帧长（毫秒）、绝对阈值（dBFS）、相对最响帧的动态范围（dB）、语音前后保留的余量（毫秒）
+ASR_VAD_FRAME_MS = int(os.getenv("ASR_VAD_FRAME_MS", "30"))
+ASR_VAD_THRESHOLD_DB = float(os.getenv("ASR_VAD_THRESHOLD_DB", "-45"))
+ASR_VAD_DYNAMIC_RANGE_DB = float(os.getenv("ASR_VAD_DYNAMIC_RANGE_DB", "35"))
+ASR_VAD_PADDING_MS = int(os.getenv("ASR_VAD_PADDING_MS", "200"))
+
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+# 输出格式 -> (ffmpeg 参数, 文件名, Content-Type)
+_OUTPUT_FORMATS = {
+    "ogg": (["-c:a", "libopus", "-b:a", ASR_PREPROCESS_OPUS_BITRATE, "-f", "ogg"], "audio.ogg", "audio/ogg"),
+    "flac": (["-c:a", "flac", "-f", "flac"], "audio.flac", "audio/flac"),
+}
+
+
+class PreprocessResult(NamedTuple):
+    """预处理结果（applied 为 False 时 audio 为原始音频）"""
+    audio: bytes
+    applied: bool
+    original_bytes: int
+    processed_bytes: int
+    original_duration: Optional[float] = None
+    processed_duration: Optional[float] = None
+    reason: Optional[str] = None
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "applied": self.applied,
+            "original_bytes": self.original_bytes,
+            "processed_bytes": self.processed_bytes,
+            "original_duration": round(self.original_duration, 3) if self.original_duration is not None else None,
+            "processed_duration": round(self.processed_duration, 3) if self.processed_duration is not None else None,
+            "reason": self.reason,
+        }
+
+
+def _decode_wav(data: bytes) -> Optional[Tuple["np.ndarray", int]]:
+    """解析 PCM WAV，返回 (单声道 float32 样本, 采样率)；不支持的 WAV 返回 None"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        return None
+
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def _resample(samples: "np.ndarray", source_rate: int, target_rate: int) -> "np.ndarray":
+    """重采样：整数倍降采样按块平均（兼作低通），其他比例线性插值"""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    if source_rate > target_rate and source_rate % target_rate == 0:
+        factor = source_rate // target_rate
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1)
+    target_length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.linspace(0, len(samples) - 1, target_length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def trim_silence(samples: "np.ndarray", sample_rate: int) -> "np.ndarray":
+    """
+    能量 VAD：裁掉首尾静音，保留中间的停顿（停顿影响流利度评分）
+
+    阈值取绝对阈值与"最响帧 - 动态范围"中较高者，适应不同的录音音量；
+    没有检测到语音时返回原样本
+    """
+    frame = max(1, sample_rate * ASR_VAD_FRAME_MS // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return samples
+
+    frames = samples[: count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(ASR_VAD_THRESHOLD_DB, float(energy_db.max()) - ASR_VAD_DYNAMIC_RANGE_DB)
+    voiced = np.flatnonzero(energy_db >= threshold)
+    if len(voiced) == 0:
+        return samples
+
+    padding = sample_rate * ASR_VAD_PADDING_MS // 1000
+    start = max(0, int(voiced[0]) * frame - padding)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + padding)
+    return samples[start:end]
+
+
+def _encode_wav(samples: "np.ndarray", sample_rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+async def _run_ffmpeg(args: list, data: bytes) -> bytes:
+    """通过管道调用 ffmpeg（不落盘），失败时抛出 RuntimeError"""
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_PATH, "-hide_banner", "-loglevel", "error", *args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(data), ASR_PREPROCESS_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise RuntimeError("ffmpeg timed out")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode('utf-8', 'replace')[:200]}")
+    return stdout
+
+
+class AudioPreprocessor:
+    """
+    识别前的音频预处理
+
+    - WAV 用标准库解析，其他格式（WebM/Opus、M4A、MP3 等）需要 ffmpeg
+    - 处理后的音频不比原始音频小时，按原始音频上传
+    - 记录累计的字节数和时长变化
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ASR_PREPROCESS_ENABLED,
+        sample_rate: int = ASR_PREPROCESS_SAMPLE_RATE,
+        output_format: str = ASR_PREPROCESS_FORMAT
+    ):
+        if output_format == "auto":
+            output_format = "ogg" if FFMPEG_PATH else "wav"
+        if output_format in _OUTPUT_FORMATS and not FFMPEG_PATH:
+            logger.warning(f"ffmpeg 未安装，音频预处理输出格式 {output_format} 改为 wav")
+            output_format = "wav"
+        self.enabled = enabled and np is not None
+        self.sample_rate = sample_rate
+        self.output_format = output_format
+        self.processed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+
+    async def _decode(self, data: bytes) -> Optional["np.ndarray"]:
+        """解码为目标采样率的单声道 float32 样本，无法解码时返回 None"""
+        decoded = _decode_wav(data) if data[:4] == b"RIFF" else None
+        if decoded is not None:
+            samples, source_rate = decoded
+            return await asyncio.to_thread(_resample, samples, source_rate, self.sample_rate)
+        if not FFMPEG_PATH:
+            return None
+        # ffmpeg 同时完成解码、转单声道和重采样
+        pcm = await _run_ffmpeg(
+            ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(self.sample_rate), "pipe:1"],
+            data
+        )
+        return np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768
+
+    async def _encode(self, samples: "np.ndarray") -> bytes:
+        wav = await asyncio.to_thread(_encode_wav, samples, self.sample_rate)
+        if self.output_format not in _OUTPUT_FORMATS:
+            return wav
+        codec_args, _, _ = _OUTPUT_FORMATS[self.output_format]
+        return await _run_ffmpeg(["-f", "wav", "-i", "pipe:0", *codec_args, "pipe:1"], wav)
+
+    async def process(self, audio_data: bytes) -> PreprocessResult:
+        """
+        预处理音频
+
+        Args:
+            audio_data: 浏览器上传的原始音频
+
+        Returns:
+            PreprocessResult，失败或没有收益时 audio 为原始音频
+        """
+        original_bytes = len(audio_data)
+        if not self.enabled:
+            return PreprocessResult(audio_data, False, original_bytes, original_bytes, reason="disabled")
+
+        try:
+            samples = await self._decode(audio_data)
+            if samples is None:
+                self.skipped += 1
+                return PreprocessResult(audio_data, False, original_bytes, original_bytes, reason="unsupported_format")
+            original_duration = len(samples) / self.sample_rate
+
+            trimmed = await asyncio.to_thread(trim_silence, samples, self.sample_rate)
+            processed_duration = len(trimmed) / self.sample_rate
+            encoded = await self._encode(trimmed)
+        except Exception as e:
+            self.skipped += 1
+            logger.warning(f"音频预处理失败，使用原始音频: {e}")
+            return PreprocessResult(audio_data, False, original_bytes, original_bytes, reason="error")
+
+        if len(encoded) >= original_bytes:
+            self.skipped += 1
+            return PreprocessResult(
+                audio_data, False, original_bytes, original_bytes,
+                original_duration, original_duration, reason="no_gain"
+            )
+
+        self.processed += 1
+        self.bytes_in += original_bytes
+        self.bytes_out += len(encoded)
+        self.seconds_in += original_duration
+        self.seconds_out += processed_duration
+        logger.info(
+            f"音频预处理: {original_bytes} -> {len(encoded)} 字节, "
+            f"{original_duration:.2f}s -> {processed_duration:.2f}s ({self.output_format})"
+        )
+        return PreprocessResult(
+            encoded, True, original_bytes, len(encoded), original_duration, processed_duration
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """累计的体积和时长变化"""
+        return {
+            "enabled": self.enabled,
+            "output_format": self.output_format,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "seconds_in": round(self.seconds_in, 2),
+            "seconds_out": round(self.seconds_out, 2),
+        }
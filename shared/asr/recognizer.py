@@ -1,16 +1,204 @@
 """
 语音识别器 - 支持多种引擎
 """
+import io
 import os
-import tempfile
+import time
 import logging
+import threading
 import httpx
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Dict, Any, Optional, Union
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from shared.utils.http_client import get_http_client
+from shared.asr.router import AUTO_ENGINE, EngineRouter
+from shared.asr.transcription_cache import TranscriptionCache
+from shared.asr.preprocess import AudioPreprocessor
+
 logger = logging.getLogger(__name__)
 
+# Groq SDK（同步客户端）线程池大小和最大排队数，排队超过上限时直接拒绝（503）
+ASR_SDK_WORKERS = int(os.getenv("ASR_SDK_WORKERS", "8"))
+ASR_SDK_MAX_QUEUE = int(os.getenv("ASR_SDK_MAX_QUEUE", "32"))
+
+# 识别接口接受的音频数据：bytes 或 memoryview（避免切片复制）
+AudioData = Union[bytes, bytearray, memoryview]
+
+
+class AudioBuffer(io.RawIOBase):
+    """
+    内存音频的只读文件对象
+
+    multipart 上传按块读取，音频不写临时文件，也不复制整段数据；
+    支持 seek，重试时可以从头重新发送
+    """
+
+    def __init__(self, data: AudioData):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = min(max(offset, 0), len(self._view))
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._pos)
+        buffer[:size] = self._view[self._pos:self._pos + size]
+        self._pos += size
+        return size
+
+
+# 文件头 -> (上传文件名, Content-Type)，识别 API 按扩展名判断格式
+_AUDIO_SIGNATURES = (
+    (b"OggS", ("audio.ogg", "audio/ogg")),
+    (b"fLaC", ("audio.flac", "audio/flac")),
+    (b"\x1a\x45\xdf\xa3", ("audio.webm", "audio/webm")),
+)
+
+
+def audio_file_field(audio_data: AudioData) -> tuple:
+    """multipart 文件字段：按文件头推断文件名和类型，无法识别时沿用 mp3"""
+    head = bytes(audio_data[:12])
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        filename, content_type = "audio.wav", "audio/wav"
+    else:
+        filename, content_type = next(
+            (info for signature, info in _AUDIO_SIGNATURES if head.startswith(signature)),
+            ("audio.mp3", "audio/mpeg")
+        )
+    return filename, AudioBuffer(audio_data), content_type
+
+
+class RecognizerBusyError(RuntimeError):
+    """识别任务排队已满，调用方应返回 503 并让客户端稍后重试"""
+
+    def __init__(self, queued: int, max_queue: int, retry_after: int = 1):
+        super().__init__(f"ASR queue is full ({queued}/{max_queue})")
+        self.retry_after = retry_after
+
+
+class TranscriptionExecutor:
+    """
+    同步 SDK 调用的常驻有界线程池
+
+    - 线程池随识别器创建一次，不再每个请求新建和销毁
+    - 等待线程的任务数超过 max_queue 时抛出 RecognizerBusyError，不再无限排队
+    - 记录排队深度、执行中数量和耗时分布
+    """
+
+    def __init__(
+        self,
+        workers: int = ASR_SDK_WORKERS,
+        max_queue: int = ASR_SDK_MAX_QUEUE,
+        history_size: int = 512
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # pending 在事件循环中维护（已提交未完成），in_flight 在工作线程中维护（正在执行）
+        self.pending = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        # 成功完成 / 抛出异常的调用数
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # 最近的 (排队耗时, 执行耗时)，单位秒
+        self._latencies: deque = deque(maxlen=history_size)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="asr-sdk"
+            )
+        return self._executor
+
+    @property
+    def queued(self) -> int:
+        """等待空闲线程的任务数"""
+        return max(0, self.pending - self.in_flight)
+
+    async def run(self, func, *args):
+        """在线程池中执行 func(*args)"""
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"ASR 线程池排队已满 ({self.queued}/{self.max_queue})，拒绝请求")
+            raise RecognizerBusyError(self.queued, self.max_queue)
+
+        submitted = time.perf_counter()
+        timings = [submitted, submitted]
+
+        def _timed():
+            timings[0] = time.perf_counter()
+            with self._lock:
+                self.in_flight += 1
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                timings[1] = time.perf_counter()
+
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, _timed)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            started, finished = timings
+            self._latencies.append((started - submitted, max(0.0, finished - started)))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """排队深度、执行中数量和耗时统计（毫秒）"""
+        def _percentile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+        queue_times = [queued for queued, _ in self._latencies]
+        run_times = [elapsed for _, elapsed in self._latencies]
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "run_ms_p50": _percentile(run_times, 0.5),
+            "run_ms_p95": _percentile(run_times, 0.95),
+            "queue_ms_p50": _percentile(queue_times, 0.5),
+            "queue_ms_p95": _percentile(queue_times, 0.95),
+        }
+
 
 class SpeechRecognizer:
     """语音识别器"""
@@ -24,6 +212,19 @@ class SpeechRecognizer:
         self.baidu_api_key = os.getenv("BAIDU_API_KEY")
         self.baidu_secret_key = os.getenv("BAIDU_SECRET_KEY")
 
+        # Groq SDK 的常驻线程池和客户端（客户端内部的连接池在多次调用间复用）
+        self.sdk_executor = TranscriptionExecutor()
+        self._groq_client = None
+
+        # 多引擎路由：按健康度选择引擎，失败时切换（本地排队已满不计入引擎健康度）
+        self.router = EngineRouter(self._dispatch, passthrough_errors=(RecognizerBusyError,))
+
+        # 识别结果缓存：相同音频 + 语言 + 引擎直接返回缓存结果，并发的重复请求只识别一次
+        self.cache = TranscriptionCache()
+
+        # 上传前的本地音频预处理（单声道 16 kHz、裁掉首尾静音）
+        self.preprocessor = AudioPreprocessor()
+
         # 记录 API Key 状态
         if self.groq_api_key:
             logger.info(f"Groq API Key loaded: {self.groq_api_key[:10]}...{self.groq_api_key[-6:]}")
@@ -35,6 +236,32 @@ class SpeechRecognizer:
         else:
             logger.info("DeepInfra API Key not configured")
 
+    def _get_groq_client(self):
+        """获取复用的 Groq SDK 客户端（未安装 SDK 时抛出 ImportError）"""
+        if self._groq_client is None:
+            from groq import Groq
+            self._groq_client = Groq(api_key=self.groq_api_key)
+        return self._groq_client
+
+    def close(self):
+        """释放线程池和 SDK 客户端（应用关闭时调用）"""
+        self.sdk_executor.close()
+        if self._groq_client is not None:
+            try:
+                self._groq_client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close Groq client: {e}")
+            self._groq_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """识别器运行指标"""
+        return {
+            "groq_sdk": self.sdk_executor.stats(),
+            "router": self.router.stats(),
+            "cache": self.cache.stats(),
+            "preprocess": self.preprocessor.stats()
+        }
+
     def _clean_api_key(self, api_key: Optional[str]) -> Optional[str]:
         """
         清理 API Key，去除引号和空格
@@ -117,6 +344,15 @@ class SpeechRecognizer:
                 "available": True
             })
 
+        # 配置了多个识别 API 时可以自动选择
+        if any(item["id"] in self.router.engines for item in engines):
+            engines.insert(0, {
+                "id": AUTO_ENGINE,
+                "name": "自动选择",
+                "description": "根据延迟和错误率自动选择最稳定的引擎，失败时自动切换",
+                "available": True
+            })
+
         # 如果没有配置任何 API，添加默认的 DeepInfra 引擎
         if not engines:
             engines.append({
@@ -130,21 +366,75 @@ class SpeechRecognizer:
 
     async def recognize(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str = "en-US",
-        engine: str = "groq-whisper"
+        engine: str = AUTO_ENGINE,
+        preprocess: bool = False
     ) -> Dict[str, Any]:
         """
         识别音频
 
         Args:
-            audio_data: 音频二进制数据
+            audio_data: 音频二进制数据（bytes 或 memoryview）
             language: 语言代码
-            engine: 识别引擎
+            engine: 识别引擎；auto 由路由选择最健康的引擎，
+                指定参与路由的引擎时优先使用该引擎，失败或已降级时自动切换
+            preprocess: 是否在识别前本地预处理音频。缓存按原始音频查询，
+                只有未命中时才预处理，预处理配置变化也不影响已有的缓存条目
 
         Returns:
-            识别结果 {"text": "...", "confidence": 0.95, "duration": 3.5}
+            识别结果 {"text": "...", "confidence": 0.95, "duration": 3.5}，
+            命中缓存时带 "cached": True；preprocess 为 True 时带 "preprocess" 报告
+            （本次请求没有执行预处理时为 None）
         """
+        prepared = None
+
+        async def _recognize() -> Dict[str, Any]:
+            nonlocal prepared
+            audio = audio_data
+            if preprocess:
+                prepared = await self.preprocessor.process(audio_data)
+                audio = prepared.audio
+            return await self._recognize_uncached(audio, language, engine)
+
+        result = await self.cache.get_or_recognize(audio_data, language, engine, _recognize)
+        if preprocess:
+            result = {**result, "preprocess": prepared.report() if prepared is not None else None}
+        return result
+
+    async def _recognize_uncached(
+        self,
+        audio_data: AudioData,
+        language: str,
+        engine: str
+    ) -> Dict[str, Any]:
+        """不经过缓存，按引擎路由识别"""
+        if engine != AUTO_ENGINE and engine not in self.router.engines:
+            return await self._dispatch(engine, audio_data, language)
+
+        available = [item["id"] for item in await self.get_available_engines() if item["available"]]
+        if not any(candidate in available for candidate in self.router.engines):
+            # 没有配置任何识别 API：沿用原有行为（各引擎返回模拟数据）
+            return await self._dispatch(
+                self.router.engines[0] if engine == AUTO_ENGINE else engine,
+                audio_data,
+                language
+            )
+
+        return await self.router.recognize(
+            audio_data,
+            language,
+            available,
+            preferred=None if engine == AUTO_ENGINE else engine
+        )
+
+    async def _dispatch(
+        self,
+        engine: str,
+        audio_data: AudioData,
+        language: str
+    ) -> Dict[str, Any]:
+        """调用指定引擎识别"""
         if engine == "groq-whisper":
             return await self._recognize_with_groq(audio_data, language)
         elif engine == "deepinfra":
@@ -162,16 +452,15 @@ class SpeechRecognizer:
         self,
         audio_url: str,
         language: str = "en-US",
-        engine: str = "groq-whisper"
+        engine: str = AUTO_ENGINE
     ) -> Dict[str, Any]:
         """
         从 URL 识别音频
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(audio_url)
-                response.raise_for_status()
-                audio_data = response.content
+            response = await get_http_client("download").get(audio_url)
+            response.raise_for_status()
+            audio_data = response.content
 
             return await self.recognize(audio_data, language, engine)
 
@@ -181,7 +470,7 @@ class SpeechRecognizer:
 
     async def _recognize_with_whisper(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用 OpenAI Whisper API 识别"""
@@ -192,54 +481,41 @@ class SpeechRecognizer:
                 "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
                 "confidence": 0.95,
                 "engine": "openai-whisper",
-                "language": language
+                "language": language,
+                "mock": True
             }
 
         try:
-            # 保存音频到临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_file_path = tmp_file.name
+            # 调用 OpenAI Whisper API
+            client = get_http_client("openai")
+            files = {
+                "file": audio_file_field(audio_data)
+            }
+            data = {
+                "model": "whisper-1",
+                "language": language.split("-")[0],  # en-US -> en
+                "response_format": "verbose_json"
+            }
 
-            try:
-                # 调用 OpenAI Whisper API
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    files = {
-                        "file": (os.path.basename(tmp_file_path), audio_data, "audio/mpeg")
-                    }
-                    data = {
-                        "model": "whisper-1",
-                        "language": language.split("-")[0],  # en-US -> en
-                        "response_format": "verbose_json"
-                    }
-
-                    response = await client.post(
-                        "https://api.openai.com/v1/audio/transcriptions",
-                        headers={
-                            "Authorization": f"Bearer {self.openai_api_key}"
-                        },
-                        files=files,
-                        data=data,
-                        timeout=60.0
-                    )
-                    response.raise_for_status()
-
-                    result = response.json()
-
-                    return {
-                        "text": result.get("text", ""),
-                        "confidence": 0.95,  # Whisper 不直接返回置信度
-                        "duration": result.get("duration", 0),
-                        "engine": "openai-whisper",
-                        "language": language
-                    }
+            response = await client.post(
+                "https://api.openai.com/v1/audio/transcriptions",
+                headers={
+                    "Authorization": f"Bearer {self.openai_api_key}"
+                },
+                files=files,
+                data=data
+            )
+            response.raise_for_status()
 
-            finally:
-                # 清理临时文件
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
+            result = response.json()
+
+            return {
+                "text": result.get("text", ""),
+                "confidence": 0.95,  # Whisper 不直接返回置信度
+                "duration": result.get("duration", 0),
+                "engine": "openai-whisper",
+                "language": language
+            }
 
         except Exception as e:
             logger.error(f"OpenAI Whisper API error: {e}")
@@ -247,7 +523,7 @@ class SpeechRecognizer:
 
     async def _recognize_with_groq(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用 Groq Whisper API 识别 (超高速，有免费额度)"""
@@ -258,7 +534,8 @@ class SpeechRecognizer:
                 "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
                 "confidence": 0.95,
                 "engine": "groq-whisper",
-                "language": language
+                "language": language,
+                "mock": True
             }
 
         # 首先尝试使用 Groq 官方 SDK（更可靠的认证）
@@ -266,6 +543,8 @@ class SpeechRecognizer:
             result = await self._recognize_with_groq_sdk(audio_data, language)
             if result:
                 return result
+        except RecognizerBusyError:
+            raise
         except Exception as e:
             logger.warning(f"Groq SDK method failed: {e}, trying httpx fallback")
 
@@ -274,54 +553,39 @@ class SpeechRecognizer:
 
     async def _recognize_with_groq_sdk(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用 Groq 官方 SDK 识别（推荐，认证更可靠）"""
         try:
-            # 导入 Groq SDK
-            from groq import Groq
+            client = self._get_groq_client()
 
-            # 在线程池中运行同步代码
-            loop = asyncio.get_event_loop()
-            with ThreadPoolExecutor() as executor:
-                result = await loop.run_in_executor(
-                    executor,
-                    lambda: self._groq_transcribe_sync(audio_data, language)
-                )
-            return result
+            # 在常驻线程池中运行同步代码（排队已满时抛出 RecognizerBusyError）
+            return await self.sdk_executor.run(self._groq_transcribe_sync, client, audio_data, language)
 
         except ImportError:
             logger.warning("Groq SDK not installed, falling back to httpx")
             return None
+        except RecognizerBusyError:
+            raise
         except Exception as e:
             logger.error(f"Groq SDK error: {e}")
             return None
 
-    def _groq_transcribe_sync(self, audio_data: bytes, language: str) -> Dict[str, Any]:
+    def _groq_transcribe_sync(self, client, audio_data: AudioData, language: str) -> Dict[str, Any]:
         """Groq SDK 同步转录"""
-        from groq import Groq
         import groq
 
-        # 保存音频到临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-            tmp_file.write(audio_data)
-            tmp_file_path = tmp_file.name
-
         try:
             logger.info(f"Groq SDK: Attempting transcription with model=whisper-large-v3-turbo, language={language.split('-')[0]}")
 
-            # 创建 Groq 客户端
-            client = Groq(api_key=self.groq_api_key)
-
-            # 打开音频文件并转录
-            with open(tmp_file_path, "rb") as file:
-                transcription = client.audio.transcriptions.create(
-                    file=(tmp_file_path, file),
-                    model="whisper-large-v3-turbo",
-                    language=language.split("-")[0],
-                    response_format="verbose_json"
-                )
+            # 直接从内存缓冲区上传音频
+            transcription = client.audio.transcriptions.create(
+                file=audio_file_field(audio_data)[:2],
+                model="whisper-large-v3-turbo",
+                language=language.split("-")[0],
+                response_format="verbose_json"
+            )
 
             logger.info(f"Groq SDK: Transcription successful, text length={len(transcription.text)}")
             return {
@@ -344,64 +608,44 @@ class SpeechRecognizer:
         except Exception as e:
             logger.error(f"Groq SDK: Unexpected error: {e}")
             raise
-        finally:
-            # 清理临时文件
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
 
     async def _recognize_with_groq_httpx(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
 
         try:
-            # 保存音频到临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_file_path = tmp_file.name
+            # 调用 Groq Whisper API (兼容 OpenAI 格式)
+            client = get_http_client("groq")
+            files = {
+                "file": audio_file_field(audio_data)
+            }
+            data = {
+                "model": "whisper-large-v3-turbo",  # 使用 turbo 版本 (更快、更便宜)
+                "language": language.split("-")[0],  # en-US -> en
+                "response_format": "verbose_json"
+            }
 
-            try:
-                # 调用 Groq Whisper API (兼容 OpenAI 格式)
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    files = {
-                        "file": (os.path.basename(tmp_file_path), audio_data, "audio/mpeg")
-                    }
-                    data = {
-                        "model": "whisper-large-v3-turbo",  # 使用 turbo 版本 (更快、更便宜)
-                        "language": language.split("-")[0],  # en-US -> en
-                        "response_format": "verbose_json"
-                    }
-
-                    response = await client.post(
-                        "https://api.groq.com/openai/v1/audio/transcriptions",
-                        headers={
-                            "Authorization": f"Bearer {self.groq_api_key}"
-                        },
-                        files=files,
-                        data=data,
-                        timeout=60.0
-                    )
-                    response.raise_for_status()
-
-                    result = response.json()
-
-                    return {
-                        "text": result.get("text", ""),
-                        "confidence": 0.95,  # Whisper 不直接返回置信度
-                        "duration": result.get("duration", 0),
-                        "engine": "groq-whisper",
-                        "language": language
-                    }
+            response = await client.post(
+                "https://api.groq.com/openai/v1/audio/transcriptions",
+                headers={
+                    "Authorization": f"Bearer {self.groq_api_key}"
+                },
+                files=files,
+                data=data
+            )
+            response.raise_for_status()
 
-            finally:
-                # 清理临时文件
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
+            result = response.json()
+
+            return {
+                "text": result.get("text", ""),
+                "confidence": 0.95,  # Whisper 不直接返回置信度
+                "duration": result.get("duration", 0),
+                "engine": "groq-whisper",
+                "language": language
+            }
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 403:
@@ -445,7 +689,7 @@ class SpeechRecognizer:
 
     async def _recognize_with_azure(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用 Azure Speech Service 识别"""
@@ -456,7 +700,8 @@ class SpeechRecognizer:
                 "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
                 "confidence": 0.90,
                 "engine": "azure",
-                "language": language
+                "language": language,
+                "mock": True
             }
 
         # Azure Speech Service 实现需要使用 Azure Cognitive Services SDK
@@ -466,12 +711,13 @@ class SpeechRecognizer:
             "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
             "confidence": 0.90,
             "engine": "azure",
-            "language": language
+            "language": language,
+            "mock": True
         }
 
     async def _recognize_with_baidu(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用百度语音识别 API"""
@@ -482,7 +728,8 @@ class SpeechRecognizer:
                 "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
                 "confidence": 0.85,
                 "engine": "baidu",
-                "language": language
+                "language": language,
+                "mock": True
             }
 
         # 百度语音识别 API 实现需要先获取 token，然后调用识别接口
@@ -491,12 +738,13 @@ class SpeechRecognizer:
             "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
             "confidence": 0.85,
             "engine": "baidu",
-            "language": language
+            "language": language,
+            "mock": True
         }
 
     async def _recognize_with_deepinfra(
         self,
-        audio_data: bytes,
+        audio_data: AudioData,
         language: str
     ) -> Dict[str, Any]:
         """使用 DeepInfra Whisper API 识别"""
@@ -507,57 +755,44 @@ class SpeechRecognizer:
                 "text": "I'm working on my laptop while enjoying a fresh cup of coffee.",
                 "confidence": 0.95,
                 "engine": "deepinfra",
-                "language": language
+                "language": language,
+                "mock": True
             }
 
         try:
-            # 保存音频到临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-                tmp_file.write(audio_data)
-                tmp_file_path = tmp_file.name
+            # 调用 DeepInfra Whisper API (兼容 OpenAI 格式)
+            client = get_http_client("deepinfra")
+            files = {
+                "file": audio_file_field(audio_data)
+            }
+            data = {
+                "model": "openai/whisper-large-v3-turbo",
+                "language": language.split("-")[0],  # en-US -> en
+                "response_format": "verbose_json"
+            }
 
-            try:
-                # 调用 DeepInfra Whisper API (兼容 OpenAI 格式)
-                async with httpx.AsyncClient(timeout=60.0) as client:
-                    files = {
-                        "file": (os.path.basename(tmp_file_path), audio_data, "audio/mpeg")
-                    }
-                    data = {
-                        "model": "openai/whisper-large-v3-turbo",
-                        "language": language.split("-")[0],  # en-US -> en
-                        "response_format": "verbose_json"
-                    }
-
-                    logger.info(f"DeepInfra: Sending transcription request with model=whisper-large-v3-turbo, language={language.split('-')[0]}")
-
-                    response = await client.post(
-                        "https://api.deepinfra.com/v1/audio/transcriptions",
-                        headers={
-                            "Authorization": f"Bearer {self.deepinfra_api_key}"
-                        },
-                        files=files,
-                        data=data,
-                        timeout=60.0
-                    )
-                    response.raise_for_status()
-
-                    result = response.json()
-                    logger.info(f"DeepInfra: Transcription successful, text length={len(result.get('text', ''))}")
-
-                    return {
-                        "text": result.get("text", ""),
-                        "confidence": 0.95,  # Whisper 不直接返回置信度
-                        "duration": result.get("duration", 0),
-                        "engine": "deepinfra",
-                        "language": language
-                    }
+            logger.info(f"DeepInfra: Sending transcription request with model=whisper-large-v3-turbo, language={language.split('-')[0]}")
 
-            finally:
-                # 清理临时文件
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
+            response = await client.post(
+                "https://api.deepinfra.com/v1/audio/transcriptions",
+                headers={
+                    "Authorization": f"Bearer {self.deepinfra_api_key}"
+                },
+                files=files,
+                data=data
+            )
+            response.raise_for_status()
+
+            result = response.json()
+            logger.info(f"DeepInfra: Transcription successful, text length={len(result.get('text', ''))}")
+
+            return {
+                "text": result.get("text", ""),
+                "confidence": 0.95,  # Whisper 不直接返回置信度
+                "duration": result.get("duration", 0),
+                "engine": "deepinfra",
+                "language": language
+            }
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 401:
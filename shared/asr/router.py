@@ -0,0 +1,269 @@
+"""
+ASR 引擎路由
+根据各引擎最近的延迟和错误率选择最健康的引擎，失败时自动切换，并支持对冲请求
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 参与路由的引擎（按优先级），只包含真正调用识别 API 的引擎
+ASR_ROUTER_ENGINES = [
+    engine.strip()
+    for engine in os.getenv("ASR_ROUTER_ENGINES", "groq-whisper,deepinfra,openai-whisper").split(",")
+    if engine.strip()
+]
+# 每个引擎保留的最近调用数
+ASR_ROUTER_WINDOW = int(os.getenv("ASR_ROUTER_WINDOW", "50"))
+# 没有调用记录的引擎按此延迟（秒）参与排序，使明显变慢的引擎会让位给未试过的引擎
+ASR_ROUTER_PRIOR_LATENCY = float(os.getenv("ASR_ROUTER_PRIOR_LATENCY", "2"))
+# 自动降级：最近至少 MIN_SAMPLES 次调用中错误率或 p95 延迟超过阈值时，降级 DEMOTE_SECONDS 秒
+ASR_ROUTER_MIN_SAMPLES = int(os.getenv("ASR_ROUTER_MIN_SAMPLES", "5"))
+ASR_ROUTER_DEMOTE_ERROR_RATE = float(os.getenv("ASR_ROUTER_DEMOTE_ERROR_RATE", "0.5"))
+ASR_ROUTER_DEMOTE_P95 = float(os.getenv("ASR_ROUTER_DEMOTE_P95", "20"))
+ASR_ROUTER_DEMOTE_SECONDS = float(os.getenv("ASR_ROUTER_DEMOTE_SECONDS", "60"))
+# 对冲请求：首选引擎超过其 p95 延迟仍未返回时，同时请求下一个引擎，取先返回的有效结果
+# 会增加第三方 API 调用量，默认关闭
+ASR_HEDGE_ENABLED = os.getenv("ASR_HEDGE_ENABLED", "false").lower() == "true"
+ASR_HEDGE_MIN_DELAY = float(os.getenv("ASR_HEDGE_MIN_DELAY", "1"))
+ASR_HEDGE_MAX_DELAY = float(os.getenv("ASR_HEDGE_MAX_DELAY", "10"))
+
+AUTO_ENGINE = "auto"
+
+Dispatch = Callable[[str, Any, str], Awaitable[Dict[str, Any]]]
+
+
+def is_good_result(result: Optional[Dict[str, Any]]) -> bool:
+    """识别结果是否有效（引擎出错时返回的是带 mock/error 标记的空结果）"""
+    return bool(result) and not result.get("mock") and not result.get("error")
+
+
+class EngineHealth:
+    """单个引擎的滚动延迟和错误率"""
+
+    def __init__(self, engine: str, window: int = ASR_ROUTER_WINDOW):
+        self.engine = engine
+        # 最近的 (耗时秒, 是否成功)
+        self._samples: deque = deque(maxlen=window)
+        self.demoted_until = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.demotions = 0
+
+    def record(self, latency: float, ok: bool):
+        self.calls += 1
+        if not ok:
+            self.failures += 1
+        self._samples.append((latency, ok))
+
+        if len(self._samples) < ASR_ROUTER_MIN_SAMPLES or self.is_demoted:
+            return
+        error_rate = self.error_rate
+        p95 = self.latency_percentile(0.95)
+        if error_rate >= ASR_ROUTER_DEMOTE_ERROR_RATE or (p95 is not None and p95 >= ASR_ROUTER_DEMOTE_P95):
+            self.demoted_until = time.monotonic() + ASR_ROUTER_DEMOTE_SECONDS
+            self.demotions += 1
+            # 降级期满后按新样本重新评估
+            self._samples.clear()
+            logger.warning(
+                f"ASR 引擎 {self.engine} 已降级 {ASR_ROUTER_DEMOTE_SECONDS:.0f} 秒 "
+                f"(错误率 {error_rate:.0%}, p95 {p95 or 0:.2f}s)"
+            )
+
+    @property
+    def is_demoted(self) -> bool:
+        return time.monotonic() < self.demoted_until
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """成功调用的延迟分位数（秒），没有记录时返回 None"""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def score(self) -> float:
+        """越小越健康：中位延迟按成功率放大"""
+        p50 = self.latency_percentile(0.5)
+        if p50 is None:
+            p50 = ASR_ROUTER_PRIOR_LATENCY
+        return p50 / max(0.05, 1.0 - self.error_rate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "window": len(self._samples),
+            "error_rate": round(self.error_rate, 3),
+            "latency_ms_p50": round(p50 * 1000, 1) if p50 is not None else None,
+            "latency_ms_p95": round(p95 * 1000, 1) if p95 is not None else None,
+            "demoted": self.is_demoted,
+            "demotions": self.demotions,
+        }
+
+
+class EngineRouter:
+    """
+    多引擎路由
+
+    - 按健康度排序候选引擎（显式指定的引擎未降级时排在最前），依次尝试直到拿到有效结果
+    - 开启对冲时，首选引擎超过其 p95 延迟仍未返回，就并行请求下一个引擎
+    - 所有引擎都失败时返回最后一个出错结果（保持原有的 mock/error 语义），没有结果则抛出最后的异常
+    """
+
+    def __init__(
+        self,
+        dispatch: Dispatch,
+        engines: Optional[List[str]] = None,
+        hedge: bool = ASR_HEDGE_ENABLED,
+        passthrough_errors: tuple = ()
+    ):
+        """
+        Args:
+            dispatch: 调用单个引擎的协程函数 dispatch(engine, audio_data, language)
+            engines: 参与路由的引擎（按优先级）
+            hedge: 是否启用对冲请求
+            passthrough_errors: 不计入引擎健康度、直接向上抛出的异常（如本地排队已满）
+        """
+        self._dispatch = dispatch
+        self.engines = list(engines if engines is not None else ASR_ROUTER_ENGINES)
+        self.hedge = hedge
+        self.passthrough_errors = passthrough_errors
+        self.health: Dict[str, EngineHealth] = {engine: EngineHealth(engine) for engine in self.engines}
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def rank(self, available: List[str], preferred: Optional[str] = None) -> List[str]:
+        """按健康度排序候选引擎，降级的引擎排在最后"""
+        candidates = [engine for engine in self.engines if engine in available]
+        order = {engine: index for index, engine in enumerate(candidates)}
+
+        def _key(engine: str):
+            health = self.health[engine]
+            return (health.is_demoted, engine != preferred, health.score(), order[engine])
+
+        return sorted(candidates, key=_key)
+
+    async def _call(self, engine: str, audio_data, language: str) -> Dict[str, Any]:
+        """调用单个引擎并记录延迟和结果"""
+        started = time.perf_counter()
+        try:
+            result = await self._dispatch(engine, audio_data, language)
+        except self.passthrough_errors:
+            raise
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.health[engine].record(time.perf_counter() - started, False)
+            raise
+        self.health[engine].record(time.perf_counter() - started, is_good_result(result))
+        return result
+
+    def _hedge_delay(self, engine: str) -> float:
+        p95 = self.health[engine].latency_percentile(0.95)
+        if p95 is None:
+            p95 = ASR_HEDGE_MAX_DELAY
+        return min(max(p95, ASR_HEDGE_MIN_DELAY), ASR_HEDGE_MAX_DELAY)
+
+    async def recognize(
+        self,
+        audio_data,
+        language: str,
+        available: List[str],
+        preferred: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        路由识别请求
+
+        Args:
+            audio_data: 音频数据
+            language: 语言代码
+            available: 当前已配置（可用）的引擎 ID
+            preferred: 调用方指定的引擎，未降级时优先使用
+        """
+        candidates = self.rank(available, preferred)
+        if not candidates:
+            raise ValueError("No ASR engine is available")
+
+        pending: Dict[asyncio.Task, str] = {}
+        last_result: Optional[Dict[str, Any]] = None
+        last_error: Optional[BaseException] = None
+        passthrough: Optional[BaseException] = None
+        next_index = 0
+
+        def _launch() -> bool:
+            nonlocal next_index
+            if next_index >= len(candidates):
+                return False
+            engine = candidates[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._call(engine, audio_data, language))] = engine
+            return True
+
+        _launch()
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 首选引擎超过 p95 仍未返回，对冲请求下一个引擎
+                    self.hedged += 1
+                    logger.info(f"ASR hedging: {next(iter(pending.values()))} is slow, also trying {candidates[next_index]}")
+                    _launch()
+                    continue
+
+                for task in done:
+                    engine = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except self.passthrough_errors as e:
+                        passthrough = e
+                        continue
+                    except Exception as e:
+                        logger.warning(f"ASR engine {engine} failed: {e}")
+                        last_error = e
+                        continue
+                    if is_good_result(result):
+                        if pending:
+                            # 对冲请求中先返回的一方胜出
+                            self.hedge_wins += engine != candidates[0]
+                        return result
+                    logger.warning(f"ASR engine {engine} returned error result: {result.get('error')}")
+                    last_result = result
+
+                # 当前没有进行中的请求时，切换到下一个引擎
+                if not pending and _launch():
+                    self.failovers += 1
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_result is not None:
+            return last_result
+        if last_error is not None:
+            raise last_error
+        raise passthrough
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engines": {engine: health.snapshot() for engine, health in self.health.items()},
+            "hedge_enabled": self.hedge,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
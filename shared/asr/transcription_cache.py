@@ -0,0 +1,173 @@
+"""
+语音识别结果缓存
+按音频内容哈希 + 语言 + 引擎缓存识别结果，重复提交的录音不再调用付费识别 API
+"""
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from shared.utils.cache import get_cache
+from shared.asr.router import is_good_result
+
+logger = logging.getLogger(__name__)
+
+# 是否启用识别结果缓存
+ASR_CACHE_ENABLED = os.getenv("ASR_CACHE_ENABLED", "true").lower() == "true"
+# 缓存时间（秒）
+ASR_CACHE_TTL = int(os.getenv("ASR_CACHE_TTL", str(7 * 86400)))
+# Redis 中最多保留的识别结果数，超出时按写入顺序淘汰最早的条目
+ASR_CACHE_MAX_ENTRIES = int(os.getenv("ASR_CACHE_MAX_ENTRIES", "20000"))
+# 超过此大小的音频不参与缓存（字节）
+ASR_CACHE_MAX_AUDIO_BYTES = int(os.getenv("ASR_CACHE_MAX_AUDIO_BYTES", str(10 * 1024 * 1024)))
+
+ASR_CACHE_KEY_PREFIX = "asr:transcript"
+# 记录缓存键写入顺序的有序集合，用于限制条目数
+ASR_CACHE_INDEX_KEY = "asr:transcript:index"
+
+# 登记新条目，条目数超过上限时删除最早写入的条目
+_TRIM_SCRIPT = """
+redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+local excess = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[3])
+if excess <= 0 then
+    return 0
+end
+local evicted = redis.call('ZPOPMIN', KEYS[1], excess)
+for i = 1, #evicted, 2 do
+    redis.call('DEL', evicted[i])
+end
+return excess
+"""
+
+
+def audio_digest(audio_data) -> str:
+    """音频内容哈希（BLAKE2b，比 SHA-256 快，128 位足以区分录音）"""
+    return hashlib.blake2b(audio_data, digest_size=16).hexdigest()
+
+
+def transcription_cache_key(audio_data, language: str, engine: str) -> str:
+    """识别结果缓存键"""
+    return f"{ASR_CACHE_KEY_PREFIX}:{engine}:{language}:{audio_digest(audio_data)}"
+
+
+class TranscriptionCache:
+    """
+    识别结果缓存
+
+    - 命中 Redis（含进程内 L1）时直接返回，不调用识别 API
+    - 同一段音频的并发请求只调用一次识别 API，其余请求等待同一个结果
+    - 只缓存有文本的有效结果，出错、模拟或空文本结果不会写入
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ASR_CACHE_ENABLED,
+        ttl: int = ASR_CACHE_TTL,
+        max_entries: int = ASR_CACHE_MAX_ENTRIES,
+        max_audio_bytes: int = ASR_CACHE_MAX_AUDIO_BYTES
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_audio_bytes = max_audio_bytes
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.lookups = 0
+        self.hits = 0
+        self.deduplicated = 0
+        self.upstream_calls = 0
+        self.evicted = 0
+
+    async def get_or_recognize(
+        self,
+        audio_data,
+        language: str,
+        engine: str,
+        recognize: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        读取缓存的识别结果，未命中时调用 recognize() 并写入缓存
+
+        Args:
+            audio_data: 音频数据（bytes 或 memoryview）
+            language: 语言代码
+            engine: 请求的识别引擎
+            recognize: 实际调用识别 API 的协程函数
+        """
+        if not self.enabled or len(audio_data) > self.max_audio_bytes:
+            self.upstream_calls += 1
+            return await recognize()
+
+        self.lookups += 1
+        key = transcription_cache_key(audio_data, language, engine)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # 相同音频正在查询或识别，共享同一次调用的结果
+            self.deduplicated += 1
+            return await asyncio.shield(future)
+
+        # 检查和登记之间没有 await，并发请求一定能看到这里登记的 future
+        future = asyncio.ensure_future(self._lookup_or_recognize(key, recognize))
+        self._inflight[key] = future
+
+        def _cleanup(done: asyncio.Future):
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            # 避免无人等待时出现 "exception was never retrieved"
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(_cleanup)
+        return await asyncio.shield(future)
+
+    async def _lookup_or_recognize(
+        self,
+        key: str,
+        recognize: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """读取缓存，未命中时识别并写入缓存（每个键同一时间只有一个此任务）"""
+        cache = get_cache()
+        if cache is not None:
+            cached = await cache.get(key)
+            if cached:
+                self.hits += 1
+                return {**cached, "cached": True}
+
+        self.upstream_calls += 1
+        result = await recognize()
+
+        if cache is not None and self._is_cacheable(result):
+            if await cache.set(key, result, self.ttl):
+                evicted = await cache.run_script(
+                    _TRIM_SCRIPT,
+                    [ASR_CACHE_INDEX_KEY],
+                    [int(time.time() * 1000), key, self.max_entries]
+                )
+                if evicted:
+                    self.evicted += int(evicted)
+        return result
+
+    @staticmethod
+    def _is_cacheable(result: Optional[Dict[str, Any]]) -> bool:
+        """只缓存有实际文本的有效结果，空文本（静音或识别失败）下次仍重新识别"""
+        if not is_good_result(result):
+            return False
+        text = result.get("text")
+        return isinstance(text, str) and bool(text.strip())
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率和节省的识别 API 调用次数"""
+        saved = self.hits + self.deduplicated
+        return {
+            "enabled": self.enabled,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "deduplicated": self.deduplicated,
+            "hit_ratio": round(saved / self.lookups, 3) if self.lookups else 0.0,
+            "upstream_calls": self.upstream_calls,
+            "upstream_calls_saved": saved,
+            "evicted": self.evicted,
+            "inflight": len(self._inflight),
+        }
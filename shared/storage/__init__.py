@@ -0,0 +1,7 @@
+"""
+对象存储模块
+
+包含:
+- blob_store: 本地文件系统 / S3 兼容对象存储
+- avatar: 按内容哈希寻址的用户头像存储
+"""
@@ -0,0 +1,205 @@
+"""
+用户头像存储
+头像按内容哈希寻址保存到对象存储，users.avatar_url 只保存短 URL
+"""
+import io
+import os
+import re
+import base64
+import asyncio
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+from shared.storage.blob_store import BlobStore, get_blob_store
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖：未安装 Pillow 时不生成缩略图，按原图返回
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - 取决于部署环境
+    Image = None
+
+# 头像 URL 前缀（API 网关的公网地址）
+# 前端可能与网关不同源，users.avatar_url 必须保存绝对 URL；
+# 未配置时 check_avatar_config 失败，auth-service 按原方式把 base64 头像保存在 users 表中
+AVATAR_PUBLIC_BASE_URL = os.getenv("AVATAR_PUBLIC_BASE_URL", "").rstrip("/")
+AVATAR_URL_PATH = "/user/avatar"
+# 原图大小上限（字节）
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+# 缩略图边长（像素）
+AVATAR_THUMBNAIL_SIZES: List[int] = [
+    int(size) for size in os.getenv("AVATAR_THUMBNAIL_SIZES", "64,256").split(",") if size.strip()
+]
+
+# 文件头 -> Content-Type
+_IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+_DATA_URL_PATTERN = re.compile(r"^data:(?P<type>[\w/+.-]+)?(;[\w=-]+)*;base64,", re.IGNORECASE)
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class AvatarError(ValueError):
+    """头像数据无效"""
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """根据文件头判断图片类型"""
+    for signature, content_type in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def is_inline_avatar(value: Optional[str]) -> bool:
+    """是否为内联的 base64 头像（而不是 URL）"""
+    if not value:
+        return False
+    return not value.startswith(("http://", "https://", "/"))
+
+
+def decode_inline_avatar(value: str) -> bytes:
+    """解析 data URL 或纯 base64 字符串"""
+    match = _DATA_URL_PATTERN.match(value)
+    payload = value[match.end():] if match else value
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (ValueError, TypeError) as e:
+        raise AvatarError("头像数据不是有效的 base64") from e
+
+
+def check_avatar_config():
+    """
+    确认头像存储配置完整，否则抛出 RuntimeError
+
+    - AVATAR_PUBLIC_BASE_URL 必须是 http(s) 绝对地址
+    - 对象存储必须是 S3 或显式配置的持久化目录（见 get_blob_store）
+    """
+    if not AVATAR_PUBLIC_BASE_URL.startswith(("http://", "https://")):
+        raise RuntimeError(
+            "AVATAR_PUBLIC_BASE_URL must be set to the public gateway URL (e.g. https://api.example.com)"
+        )
+    get_blob_store()
+
+
+def avatar_url(digest: str) -> str:
+    """头像绝对 URL"""
+    return f"{AVATAR_PUBLIC_BASE_URL}{AVATAR_URL_PATH}/{digest}"
+
+
+def _original_key(digest: str) -> str:
+    return f"avatars/{digest[:2]}/{digest}"
+
+
+def _thumbnail_key(digest: str, size: int) -> str:
+    return f"avatars/{digest[:2]}/{digest}_{size}.jpg"
+
+
+def _make_thumbnails(data: bytes) -> List[Tuple[int, bytes]]:
+    """生成正方形 JPEG 缩略图（居中裁剪）"""
+    thumbnails = []
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        side = min(image.size)
+        left = (image.width - side) // 2
+        top = (image.height - side) // 2
+        square = image.crop((left, top, left + side, top + side))
+        for size in AVATAR_THUMBNAIL_SIZES:
+            thumbnail = square.resize((size, size), Image.LANCZOS) if side > size else square
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, "JPEG", quality=85, optimize=True)
+            thumbnails.append((size, buffer.getvalue()))
+    return thumbnails
+
+
+class AvatarStore:
+    """头像存储"""
+
+    def __init__(self, blob_store: Optional[BlobStore] = None):
+        self._blob_store = blob_store
+
+    @property
+    def blob_store(self) -> BlobStore:
+        if self._blob_store is None:
+            self._blob_store = get_blob_store()
+        return self._blob_store
+
+    async def save(self, data: bytes) -> str:
+        """
+        保存头像原图和缩略图
+
+        Args:
+            data: 图片数据
+
+        Returns:
+            内容哈希（相同图片只保存一次）
+
+        Raises:
+            AvatarError: 图片过大或格式不支持
+        """
+        if len(data) > AVATAR_MAX_BYTES:
+            raise AvatarError(f"头像不能超过 {AVATAR_MAX_BYTES // 1024 // 1024} MB")
+        content_type = sniff_image_type(data)
+        if content_type is None:
+            raise AvatarError("头像格式不支持，请上传 PNG、JPEG、GIF 或 WebP 图片")
+
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        key = _original_key(digest)
+        if await self.blob_store.exists(key):
+            return digest
+
+        if Image is not None:
+            try:
+                thumbnails = await asyncio.to_thread(_make_thumbnails, data)
+            except Exception as e:
+                raise AvatarError("无法解析头像图片") from e
+            for size, thumbnail in thumbnails:
+                await self.blob_store.put(_thumbnail_key(digest, size), thumbnail, "image/jpeg")
+
+        # 原图最后写入，存在原图即表示缩略图已生成
+        await self.blob_store.put(key, data, content_type)
+        logger.info(f"头像已保存: {digest} ({len(data)} 字节)")
+        return digest
+
+    async def save_inline(self, value: str) -> str:
+        """保存 base64 头像并返回短 URL"""
+        return avatar_url(await self.save(decode_inline_avatar(value)))
+
+    async def load(self, digest: str, size: Optional[int] = None) -> Optional[Tuple[bytes, str]]:
+        """
+        读取头像
+
+        Args:
+            digest: 内容哈希
+            size: 缩略图边长，None 或不支持的尺寸返回原图
+
+        Returns:
+            (数据, Content-Type)，不存在时返回 None
+        """
+        if not _DIGEST_PATTERN.match(digest):
+            return None
+        if size in AVATAR_THUMBNAIL_SIZES:
+            thumbnail = await self.blob_store.get(_thumbnail_key(digest, size))
+            if thumbnail is not None:
+                return thumbnail
+        return await self.blob_store.get(_original_key(digest))
+
+
+_avatar_store: Optional[AvatarStore] = None
+
+
+def get_avatar_store() -> AvatarStore:
+    """获取全局头像存储（配置不完整时抛出 RuntimeError）"""
+    global _avatar_store
+    if _avatar_store is None:
+        check_avatar_config()
+        _avatar_store = AvatarStore()
+    return _avatar_store
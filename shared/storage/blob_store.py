@@ -0,0 +1,164 @@
+"""
+二进制对象存储
+支持本地文件系统和 S3 兼容存储（AWS S3、MinIO、Cloudflare R2 等）
+"""
+import os
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖：使用 S3 存储时需要安装 boto3
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - 取决于部署环境
+    boto3 = None
+    ClientError = Exception
+
+# 存储后端：local 或 s3
+BLOB_STORAGE = os.getenv("BLOB_STORAGE", "local")
+# 本地存储目录：必须显式配置为持久化卷（如 /data/blobs），多副本部署时需共享同一个卷
+# 不提供默认值，避免数据写入容器临时磁盘，重新部署后丢失
+BLOB_STORAGE_DIR = os.getenv("BLOB_STORAGE_DIR", "")
+# S3 兼容存储配置（凭证使用 boto3 标准环境变量 AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY）
+BLOB_S3_BUCKET = os.getenv("BLOB_S3_BUCKET", "")
+BLOB_S3_ENDPOINT_URL = os.getenv("BLOB_S3_ENDPOINT_URL") or None
+BLOB_S3_REGION = os.getenv("BLOB_S3_REGION") or None
+
+
+class BlobStore:
+    """对象存储接口，键为 "目录/文件名" 形式的相对路径"""
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """返回 (数据, Content-Type)，不存在时返回 None"""
+        raise NotImplementedError
+
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统存储（Content-Type 保存在同名 .type 文件中）"""
+
+    def __init__(self, root: str = BLOB_STORAGE_DIR):
+        if not root:
+            raise RuntimeError(
+                "BLOB_STORAGE_DIR is not set; point it at a persistent volume or use BLOB_STORAGE=s3"
+            )
+        resolved = Path(root).resolve()
+        temp_dir = Path(tempfile.gettempdir()).resolve()
+        if resolved == temp_dir or temp_dir in resolved.parents:
+            raise RuntimeError(
+                f"BLOB_STORAGE_DIR={root} is on temporary disk; point it at a persistent volume"
+            )
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise ValueError(f"Invalid blob key: {key}")
+        return path
+
+    def _write(self, key: str, data: bytes, content_type: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，避免并发读到写了一半的文件
+        for target, payload in ((path.with_name(path.name + ".type"), content_type.encode("utf-8")), (path, data)):
+            fd, tmp = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, target)
+
+    def _read(self, key: str) -> Optional[Tuple[bytes, str]]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            content_type = path.with_name(path.name + ".type").read_text("utf-8")
+        except FileNotFoundError:
+            content_type = "application/octet-stream"
+        return data, content_type
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(self._write, key, data, content_type)
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).exists)
+
+
+class S3BlobStore(BlobStore):
+    """S3 兼容存储（boto3 为同步客户端，在线程池中调用）"""
+
+    def __init__(
+        self,
+        bucket: str = BLOB_S3_BUCKET,
+        endpoint_url: Optional[str] = BLOB_S3_ENDPOINT_URL,
+        region: Optional[str] = BLOB_S3_REGION
+    ):
+        if boto3 is None:
+            raise RuntimeError("boto3 is required for S3 blob storage")
+        if not bucket:
+            raise RuntimeError("BLOB_S3_BUCKET is not set")
+        self.bucket = bucket
+        self._client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    async def put(self, key: str, data: bytes, content_type: str):
+        await asyncio.to_thread(
+            self._client.put_object,
+            Bucket=self.bucket,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+            CacheControl="public, max-age=31536000, immutable"
+        )
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        def _get():
+            try:
+                response = self._client.get_object(Bucket=self.bucket, Key=key)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                    return None
+                raise
+            return response["Body"].read(), response.get("ContentType", "application/octet-stream")
+
+        return await asyncio.to_thread(_get)
+
+    async def exists(self, key: str) -> bool:
+        def _exists():
+            try:
+                self._client.head_object(Bucket=self.bucket, Key=key)
+                return True
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound"):
+                    return False
+                raise
+
+        return await asyncio.to_thread(_exists)
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """获取全局对象存储（按 BLOB_STORAGE 配置，单例）"""
+    global _blob_store
+    if _blob_store is None:
+        if BLOB_STORAGE == "s3":
+            _blob_store = S3BlobStore()
+        else:
+            _blob_store = LocalBlobStore()
+        logger.info(f"对象存储已初始化: {BLOB_STORAGE}")
+    return _blob_store
@@ -2,9 +2,15 @@
 认证相关工具函数
 """
 import os
+import time
+import asyncio
+import hashlib
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, NamedTuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
@@ -13,7 +19,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from shared.database.models import User
-from shared.database.database import get_async_db
+from shared.database.database import get_async_db, get_async_db_context
+from shared.utils.cache import LocalCache, get_cache
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -22,6 +29,23 @@ logger = logging.getLogger(__name__)
 # 在环境变量中设置 SKIP_AUTH=true 来启用开发模式
 SKIP_AUTH = os.getenv("SKIP_AUTH", "false").lower() == "true"
 
+# 已验证 token 缓存：按 token 哈希保存解码后的 payload，在 token 的 exp 时过期
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+# 没有 exp 的 token 最多缓存多久（秒）
+AUTH_TOKEN_CACHE_MAX_TTL = int(os.getenv("AUTH_TOKEN_CACHE_MAX_TTL", "300"))
+# 用户快照缓存时间（秒），资料或密码修改时主动失效
+AUTH_USER_SNAPSHOT_TTL = int(os.getenv("AUTH_USER_SNAPSHOT_TTL", "300"))
+
+_verified_tokens = LocalCache(AUTH_TOKEN_CACHE_SIZE)
+
+# 密码哈希线程池：bcrypt 是 CPU 密集型操作（约 100~300ms），放到线程池执行避免阻塞事件循环
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 排队 + 执行中的哈希任务上限，超过时直接返回 503，避免登录洪峰把延迟拖到超时
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# 用户快照不包含的列
+_SNAPSHOT_EXCLUDED_COLUMNS = {"password_hash"}
+
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -31,6 +55,23 @@ security = HTTPBearer()
 security_optional = HTTPBearer(auto_error=False)
 
 
+class Principal(NamedTuple):
+    """
+    当前请求的认证主体（不可变，由 JWT 和缓存的用户快照构建，通常不查询数据库）
+
+    只需要用户 ID 的路由应使用 get_current_principal，避免加载完整的 User 行
+    （avatar_url 可能是很大的 base64 数据）
+    """
+
+    user_id: int
+    username: Optional[str] = None
+    is_anonymous: bool = False
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.user_id, user.username, bool(user.is_anonymous))
+
+
 def hash_password(password: str) -> str:
     """哈希密码"""
     return pwd_context.hash(password)
@@ -41,6 +82,116 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasher:
+    """
+    在有界线程池中执行密码哈希和校验
+
+    - 同时进行的任务数（排队 + 执行中）超过 max_pending 时抛出 503
+    - 记录每次操作耗时，便于观察 bcrypt 开销和排队情况
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        history_size: int = 512
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # pending 在事件循环中增加、在线程池的完成回调中减少
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        # 最近的 (排队耗时, 哈希耗时)，单位秒
+        self._latencies: deque = deque(maxlen=history_size)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        """在线程池中执行 func(*args)"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning(f"密码哈希队列已满 ({self.pending}/{self.max_pending})，拒绝请求")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted = time.perf_counter()
+        started = submitted
+
+        def _timed():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args)
+
+        def _done(future):
+            # 任务真正结束（或在开始前被取消）时才释放名额：
+            # 等待方被取消（如客户端断开）时线程仍在计算，不能提前减少 pending
+            finished = time.perf_counter()
+            with self._lock:
+                self.pending -= 1
+                if not future.cancelled():
+                    self.completed += 1
+                    self._latencies.append((started - submitted, finished - started))
+
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self.executor.submit(_timed)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        """线程池和耗时统计（毫秒）"""
+        def _percentile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+        queue_times = [queued for queued, _ in self._latencies]
+        hash_times = [elapsed for _, elapsed in self._latencies]
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "hash_ms_p50": _percentile(hash_times, 0.5),
+            "hash_ms_p95": _percentile(hash_times, 0.95),
+            "queue_ms_p50": _percentile(queue_times, 0.5),
+            "queue_ms_p95": _percentile(queue_times, 0.95),
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password_async(password: str) -> str:
+    """哈希密码（在线程池中执行，不阻塞事件循环）"""
+    return await password_hasher.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（在线程池中执行，不阻塞事件循环）"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(
     data: Dict[str, Any],
     secret_key: str,
@@ -71,6 +222,112 @@ def decode_access_token(
         return None
 
 
+def verify_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    验证 JWT Token（带缓存）
+
+    同一个 token 只做一次签名校验，结果按 token 的 SHA-256 哈希缓存到 exp 为止
+
+    Returns:
+        payload，无效时返回 None
+    """
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    hit, payload = _verified_tokens.get(token_hash)
+    if hit:
+        return payload
+
+    payload = decode_access_token(token, get_secret_key())
+    if payload is None:
+        return None
+
+    exp = payload.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else AUTH_TOKEN_CACHE_MAX_TTL
+    _verified_tokens.set(token_hash, payload, ttl)
+    return payload
+
+
+def user_snapshot_key(user_id: int) -> str:
+    """用户快照缓存键"""
+    return f"user_snapshot:{user_id}"
+
+
+def _user_to_snapshot(user: User) -> Dict[str, Any]:
+    """User 转为可缓存的字典（不含密码哈希）"""
+    snapshot = {}
+    for column in User.__table__.columns:
+        if column.name in _SNAPSHOT_EXCLUDED_COLUMNS:
+            continue
+        value = getattr(user, column.name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        snapshot[column.name] = value
+    return snapshot
+
+
+def _user_from_snapshot(snapshot: Dict[str, Any]) -> Optional[User]:
+    """
+    由快照构建未绑定会话的 User 对象
+
+    只保留 users 表现有的列（列改名或删除后旧快照仍可读取），
+    快照无法解析时返回 None，由调用方按缓存未命中处理
+    """
+    columns = User.__table__.columns.keys()
+    values = {name: value for name, value in snapshot.items() if name in columns}
+    try:
+        for name in ("created_at", "updated_at"):
+            if values.get(name):
+                values[name] = datetime.fromisoformat(values[name])
+        return User(**values)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"用户快照无法解析，按缓存未命中处理: {e}")
+        return None
+
+
+async def get_user_snapshot(db: AsyncSession, user_id: int) -> Optional[User]:
+    """
+    获取用户快照（进程内 L1 + Redis，未命中时查询数据库并写入缓存）
+
+    返回的 User 对象不绑定数据库会话、不含 password_hash，只能读取，不要修改后提交
+    """
+    cache = get_cache()
+    key = user_snapshot_key(user_id)
+
+    if cache:
+        snapshot = await cache.get(key)
+        user = _user_from_snapshot(snapshot) if isinstance(snapshot, dict) else None
+        if user is not None:
+            return user
+
+    result = await db.execute(select(User).where(User.user_id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        return None
+
+    snapshot = _user_to_snapshot(user)
+    if cache:
+        await cache.set(key, snapshot, AUTH_USER_SNAPSHOT_TTL)
+    return _user_from_snapshot(snapshot)
+
+
+async def invalidate_user_snapshot(user_id: int):
+    """用户资料或密码变更后清除快照缓存（同时通知其他副本清除 L1）"""
+    cache = get_cache()
+    if cache:
+        await cache.delete(user_snapshot_key(user_id))
+
+
+def anonymous_login_cache_key(device_id: str) -> str:
+    """设备 -> 匿名登录结果缓存键（设备ID做哈希，避免原值出现在 Redis 中）"""
+    return f"anonymous_login:{hashlib.sha256(device_id.encode('utf-8')).hexdigest()}"
+
+
+async def invalidate_anonymous_login(device_id: Optional[str]):
+    """用户资料变更或删除后清除设备的匿名登录结果缓存"""
+    cache = get_cache()
+    if cache and device_id:
+        await cache.delete(anonymous_login_cache_key(device_id))
+
+
 async def get_current_user(
     request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -144,10 +401,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = credentials.credentials
-    secret_key = get_secret_key()
-
-    payload = decode_access_token(token, secret_key)
+    payload = verify_access_token(credentials.credentials)
     if payload is None:
         raise credentials_exception
 
@@ -164,6 +418,101 @@ async def get_current_user(
     return user
 
 
+async def get_current_user_snapshot(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    从 JWT Token 中获取当前用户（读取缓存的用户快照）
+
+    依赖注入函数，用于只读取用户信息的高频路由：token 校验和用户信息都命中缓存时
+    不访问数据库。返回的 User 不绑定会话，需要修改用户的路由请使用 get_current_user
+    """
+    if SKIP_AUTH:
+        return await get_current_user(request, credentials, db)
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="无法验证认证信息",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    payload = verify_access_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
+        raise credentials_exception
+
+    user = await get_user_snapshot(db, int(payload["sub"]))
+    if user is None:
+        raise credentials_exception
+
+    return user
+
+
+async def _principal_from_payload(payload: Optional[Dict[str, Any]]) -> Optional[Principal]:
+    """
+    由 JWT payload 构建 Principal，sub 缺失或非法、用户不存在时返回 None
+
+    通过用户快照确认用户仍然存在（已删除账号的 token 在过期前不能继续使用），
+    同时以快照中的 is_anonymous 为准（早期签发的 token 没有该声明）。
+    快照有进程内 L1 + Redis 缓存，删除用户时失效，通常不查询数据库
+    """
+    if payload is None:
+        return None
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+
+    async with get_async_db_context() as db:
+        user = await get_user_snapshot(db, user_id)
+    return Principal.from_user(user) if user is not None else None
+
+
+async def get_current_principal(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
+    """
+    从 JWT Token 中获取当前认证主体
+
+    依赖注入函数，用于只需要用户 ID 的路由：校验 token 并通过缓存的用户快照确认用户存在，
+    快照命中时不查询 users 表，也不为请求占用数据库连接
+    开发模式（SKIP_AUTH=true）下与 get_current_user 行为一致
+    """
+    if SKIP_AUTH:
+        async with get_async_db_context() as db:
+            return Principal.from_user(await get_current_user(request, credentials, db))
+
+    principal = await _principal_from_payload(verify_access_token(credentials.credentials))
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无法验证认证信息",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+
+async def get_current_principal_optional(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_optional)
+) -> Optional[Principal]:
+    """
+    从 JWT Token 中获取当前认证主体（可选）
+
+    没有提供 Token 或 Token 无效时返回 None
+    """
+    if SKIP_AUTH:
+        async with get_async_db_context() as db:
+            user = await get_current_user_optional(request, credentials, db)
+        return Principal.from_user(user) if user else None
+
+    if credentials is None:
+        return None
+    return await _principal_from_payload(verify_access_token(credentials.credentials))
+
+
 def get_secret_key() -> str:
     """获取 JWT 密钥"""
     import os
@@ -241,10 +590,7 @@ async def get_current_user_optional(
     if credentials is None:
         return None
 
-    token = credentials.credentials
-    secret_key = get_secret_key()
-
-    payload = decode_access_token(token, secret_key)
+    payload = verify_access_token(credentials.credentials)
     if payload is None:
         return None
 
@@ -2,59 +2,289 @@
 Redis 缓存管理模块
 提供统一的缓存接口，支持多种缓存策略
 """
+import os
 import json
+import math
+import time
+import random
+import uuid
+import asyncio
 import logging
-from typing import Optional, Any, Callable
+from collections import OrderedDict
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple
 from functools import wraps
+from contextlib import asynccontextmanager
 import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from shared.utils.cache_codec import CacheCodec, get_codec
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+# 进程内 L1 缓存配置
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+# L1 条目最长存活时间（秒），限制多副本之间的数据陈旧窗口
+CACHE_L1_MAX_TTL = int(os.getenv("CACHE_L1_MAX_TTL", "60"))
+# 是否通过 Redis pub/sub 广播失效消息
+CACHE_L1_INVALIDATION = os.getenv("CACHE_L1_INVALIDATION", "true").lower() == "true"
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Redis 健康状态跟踪：连续失败 N 次后标记为不可用，后台按退避间隔重新探测
+CACHE_FAILURE_THRESHOLD = int(os.getenv("CACHE_FAILURE_THRESHOLD", "3"))
+CACHE_REPROBE_MIN_INTERVAL = float(os.getenv("CACHE_REPROBE_MIN_INTERVAL", "1"))
+CACHE_REPROBE_MAX_INTERVAL = float(os.getenv("CACHE_REPROBE_MAX_INTERVAL", "30"))
+
+
+def _normalize_value(value: Any) -> Any:
+    """JSON 字符串先解析为对象，保证 get() 返回的值与写入前一致"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+class LocalCache:
+    """
+    进程内 LRU 缓存（L1），每个条目带独立过期时间
+
+    注意：返回的是缓存对象本身，调用方不要修改返回值
+    """
+
+    def __init__(self, max_entries: int = CACHE_L1_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """返回 (是否命中, 值)"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return False, None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
 
 class RedisCache:
-    """Redis 缓存客户端"""
+    """
+    Redis 缓存客户端（两级缓存）
+
+    - L1: 进程内 LRU，命中时不访问网络
+    - L2: Redis，多个服务副本共享
+    写入/删除时通过 pub/sub 通知其他副本清除各自的 L1 条目
+    """
 
-    def __init__(self, redis_url: str):
+    def __init__(
+        self,
+        redis_url: str,
+        l1_max_entries: int = CACHE_L1_MAX_ENTRIES,
+        l1_max_ttl: int = CACHE_L1_MAX_TTL,
+        invalidation: bool = CACHE_L1_INVALIDATION,
+        codec: Optional[CacheCodec] = None
+    ):
         """
         初始化 Redis 客户端
 
         Args:
             redis_url: Redis 连接 URL，如 redis://localhost:6379
+            l1_max_entries: L1 缓存最大条目数，0 表示禁用 L1
+            l1_max_ttl: L1 条目最长存活时间（秒）
+            invalidation: 是否启用 pub/sub 跨副本失效
+            codec: 缓存值编解码器，默认按环境变量配置
         """
         self.redis_url = redis_url
+        self.codec = codec or get_codec()
         self._client: Optional[redis.Redis] = None
+        self._local = LocalCache(l1_max_entries)
+        self.l1_max_ttl = l1_max_ttl
+        self.invalidation = invalidation and l1_max_entries > 0
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+        # 已注册的 Lua 脚本（按源码缓存，绑定当前客户端）
+        self._scripts: Dict[str, Any] = {}
+
+        # 被动健康状态（不在每次操作前 PING）
+        self._healthy = True
+        self._consecutive_failures = 0
+        self._reprobe_task: Optional[asyncio.Task] = None
+
+    async def get_client(self) -> Optional[redis.Redis]:
+        """
+        获取 Redis 客户端（懒加载）
 
-    async def get_client(self) -> redis.Redis:
-        """获取 Redis 客户端（懒加载）"""
+        Redis 被标记为不可用时直接返回 None，调用方立即跳过缓存，
+        不再等待连接超时；恢复由后台探测任务负责
+        """
+        if not self._healthy:
+            return None
         if self._client is None:
             try:
-                self._client = redis.from_url(
-                    self.redis_url,
-                    encoding="utf-8",
-                    decode_responses=True,
-                    socket_connect_timeout=5,
-                    socket_timeout=5,
-                    retry_on_timeout=True
-                )
-                # 测试连接
-                await self._client.ping()
-                logger.info(f"Redis 连接成功: {self.redis_url}")
+                await self._connect()
             except Exception as e:
                 logger.warning(f"Redis 连接失败: {e}")
-                self._client = None
+                self._mark_unavailable()
         return self._client
 
-    async def is_available(self) -> bool:
-        """检查 Redis 是否可用"""
+    async def _connect(self):
+        """创建客户端并测试连接"""
+        client = redis.from_url(
+            self.redis_url,
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            retry_on_timeout=True
+        )
         try:
-            client = await self.get_client()
-            if client:
-                await client.ping()
-                return True
+            await client.ping()
+        except Exception:
+            await client.close()
+            raise
+        self._client = client
+        self._scripts.clear()
+        logger.info(f"Redis 连接成功: {self.redis_url}")
+        self._start_invalidation_listener()
+
+    def _record_success(self):
+        self._consecutive_failures = 0
+
+    def _record_failure(self, error: Exception):
+        """记录一次操作失败，连续失败达到阈值后标记 Redis 不可用"""
+        # 只统计连接类错误，序列化等业务错误不影响健康状态
+        if not isinstance(error, (RedisConnectionError, RedisTimeoutError, OSError, asyncio.TimeoutError)):
+            return
+        self._consecutive_failures += 1
+        if self._healthy and self._consecutive_failures >= CACHE_FAILURE_THRESHOLD:
+            self._mark_unavailable()
+
+    def _mark_unavailable(self):
+        """标记 Redis 不可用，并启动后台重新探测"""
+        if self._healthy:
+            logger.warning(f"Redis 标记为不可用（连续失败 {self._consecutive_failures} 次），缓存已旁路")
+        self._healthy = False
+        if self._reprobe_task is None or self._reprobe_task.done():
+            self._reprobe_task = asyncio.create_task(self._reprobe())
+
+    async def _reprobe(self):
+        """按指数退避间隔探测 Redis，恢复后重新启用缓存"""
+        interval = CACHE_REPROBE_MIN_INTERVAL
+        while not self._healthy:
+            await asyncio.sleep(interval)
+            try:
+                if self._client is None:
+                    await self._connect()
+                else:
+                    await self._client.ping()
+                self._healthy = True
+                self._consecutive_failures = 0
+                logger.info("Redis 已恢复，重新启用缓存")
+            except Exception as e:
+                logger.debug(f"Redis 探测失败: {e}")
+                interval = min(interval * 2, CACHE_REPROBE_MAX_INTERVAL)
+
+    def _local_ttl(self, expire_seconds: Optional[float]) -> float:
+        """L1 过期时间：不超过缓存策略 TTL，也不超过 L1 上限"""
+        if expire_seconds is None or expire_seconds <= 0:
+            return self.l1_max_ttl
+        return min(expire_seconds, self.l1_max_ttl)
+
+    def _start_invalidation_listener(self):
+        """启动 pub/sub 监听任务，接收其他副本的失效通知"""
+        if not self.invalidation or self._invalidation_task is not None:
+            return
+        self._invalidation_task = asyncio.create_task(self._listen_invalidations())
+
+    async def _listen_invalidations(self):
+        """订阅失效频道，清除本地 L1 中对应的键（断线后自动重连）"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub()
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("source") == self._instance_id:
+                        continue
+                    keys = payload.get("keys") or []
+                    if keys:
+                        self._local.delete(*keys)
+                    else:
+                        self._local.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"缓存失效订阅中断: {e}")
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    async def _publish_invalidation(self, client: redis.Redis, *keys: str):
+        """通知其他副本清除 L1 中的键"""
+        if not self.invalidation:
+            return
+        try:
+            payload = json.dumps({"source": self._instance_id, "keys": list(keys)})
+            await client.publish(CACHE_INVALIDATION_CHANNEL, payload)
         except Exception as e:
-            logger.debug(f"Redis 不可用: {e}")
-        return False
+            logger.debug(f"缓存失效通知发送失败 {keys}: {e}")
+
+    def local_stats(self) -> dict:
+        """L1 缓存统计"""
+        return self._local.stats()
+
+    async def is_available(self) -> bool:
+        """
+        检查 Redis 是否可用
+
+        直接返回内存中的健康状态，不发送 PING；
+        仅在尚未建立连接时尝试连接一次
+        """
+        if not self._healthy:
+            return False
+        if self._client is None:
+            return await self.get_client() is not None
+        return True
 
     async def get(self, key: str) -> Optional[Any]:
         """
@@ -66,20 +296,31 @@ class RedisCache:
         Returns:
             缓存的值，如果不存在或出错返回 None
         """
+        # L1 命中，不访问 Redis
+        hit, value = self._local.get(key)
+        if hit:
+            return value
+
         try:
             client = await self.get_client()
             if not client:
                 return None
 
-            value = await client.get(key)
+            # 同一次往返中取值和剩余 TTL，L1 过期时间不超过 Redis 中的剩余时间
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                value, pttl = await pipe.execute()
+            self._record_success()
+
             if value:
-                # 尝试解析 JSON
-                try:
-                    return json.loads(value)
-                except json.JSONDecodeError:
-                    return value
+                value = self.codec.decode(value)
+                remaining = pttl / 1000 if pttl and pttl > 0 else None
+                self._local.set(key, value, self._local_ttl(remaining))
+                return value
             return None
         except Exception as e:
+            self._record_failure(e)
             logger.warning(f"缓存读取失败 [{key}]: {e}")
             return None
 
@@ -94,7 +335,7 @@ class RedisCache:
 
         Args:
             key: 缓存键
-            value: 缓存值（自动序列化为 JSON）
+            value: 缓存值（按配置的编解码器序列化）
             expire_seconds: 过期时间（秒），None 表示不过期
 
         Returns:
@@ -105,17 +346,21 @@ class RedisCache:
             if not client:
                 return False
 
-            # 序列化值
-            if not isinstance(value, (str, int, float, bool)):
-                value = json.dumps(value, ensure_ascii=False)
+            # L1 中保存与 get() 返回值一致的对象
+            value = _normalize_value(value)
+            encoded = self.codec.encode(value)
 
             if expire_seconds:
-                await client.setex(key, expire_seconds, value)
+                await client.setex(key, expire_seconds, encoded)
             else:
-                await client.set(key, value)
+                await client.set(key, encoded)
+            self._record_success()
 
+            self._local.set(key, value, self._local_ttl(expire_seconds))
+            await self._publish_invalidation(client, key)
             return True
         except Exception as e:
+            self._record_failure(e)
             logger.warning(f"缓存设置失败 [{key}]: {e}")
             return False
 
@@ -129,6 +374,7 @@ class RedisCache:
         Returns:
             是否成功
         """
+        self._local.delete(*keys)
         try:
             client = await self.get_client()
             if not client:
@@ -136,11 +382,109 @@ class RedisCache:
 
             if keys:
                 await client.delete(*keys)
+                self._record_success()
+                await self._publish_invalidation(client, *keys)
             return True
         except Exception as e:
+            self._record_failure(e)
             logger.warning(f"缓存删除失败 {keys}: {e}")
             return False
 
+    async def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        批量获取缓存（L1 未命中的键在一次 Redis 往返中取回）
+
+        Args:
+            keys: 缓存键列表
+
+        Returns:
+            {键: 值}，只包含命中的键
+        """
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            hit, value = self._local.get(key)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if not missing:
+            return found
+
+        try:
+            client = await self.get_client()
+            if not client:
+                return found
+
+            async with client.pipeline(transaction=False) as pipe:
+                for key in missing:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                results = await pipe.execute()
+            self._record_success()
+
+            for index, key in enumerate(missing):
+                raw, pttl = results[2 * index], results[2 * index + 1]
+                if raw:
+                    value = self.codec.decode(raw)
+                    remaining = pttl / 1000 if pttl and pttl > 0 else None
+                    self._local.set(key, value, self._local_ttl(remaining))
+                    found[key] = value
+        except Exception as e:
+            self._record_failure(e)
+            logger.warning(f"批量缓存读取失败 ({len(missing)} 个键): {e}")
+
+        return found
+
+    async def mset_with_ttl(
+        self,
+        mapping: Dict[str, Any],
+        expire_seconds: Optional[int] = None
+    ) -> bool:
+        """
+        批量设置缓存（一次 Redis 往返）
+
+        Args:
+            mapping: {键: 值}
+            expire_seconds: 过期时间（秒），None 表示不过期
+
+        Returns:
+            是否成功
+        """
+        if not mapping:
+            return True
+
+        async with self.pipeline() as pipe:
+            if pipe is None:
+                return False
+            for key, value in mapping.items():
+                pipe.set(key, value, expire_seconds)
+            results = await pipe.execute()
+        return results is not None
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Optional["CachePipeline"]]:
+        """
+        批量操作上下文管理器，所有命令在 execute() 时一次性发送
+
+        Redis 不可用时返回 None
+
+        Example:
+            async with cache.pipeline() as pipe:
+                if pipe:
+                    pipe.get("a")
+                    pipe.set("b", {"x": 1}, 300)
+                    value_a, ok = await pipe.execute()
+        """
+        client = await self.get_client()
+        if not client:
+            yield None
+            return
+
+        async with client.pipeline(transaction=transaction) as pipe:
+            yield CachePipeline(self, client, pipe)
+
     async def exists(self, *keys: str) -> bool:
         """
         检查键是否存在
@@ -157,19 +501,130 @@ class RedisCache:
                 return False
 
             if keys:
-                return await client.exists(*keys) > 0
+                count = await client.exists(*keys)
+                self._record_success()
+                return count > 0
             return False
         except Exception as e:
+            self._record_failure(e)
             logger.debug(f"缓存存在检查失败 {keys}: {e}")
             return False
 
+    async def run_script(self, script: str, keys: List[str], args: List[Any]) -> Optional[Any]:
+        """
+        执行 Lua 脚本（EVALSHA，脚本未加载时自动回退为 EVAL）
+
+        脚本在 Redis 端原子执行，适合需要"读-判断-写"的场景
+
+        Args:
+            script: Lua 脚本源码
+            keys: KEYS 参数
+            args: ARGV 参数
+
+        Returns:
+            脚本返回值，Redis 不可用或执行失败时返回 None
+        """
+        try:
+            client = await self.get_client()
+            if not client:
+                return None
+
+            registered = self._scripts.get(script)
+            if registered is None:
+                registered = client.register_script(script)
+                self._scripts[script] = registered
+            result = await registered(keys=keys, args=args)
+            self._record_success()
+            return result
+        except Exception as e:
+            self._record_failure(e)
+            logger.warning(f"Lua 脚本执行失败 {keys}: {e}")
+            return None
+
     async def close(self):
         """关闭 Redis 连接"""
+        for task in (self._invalidation_task, self._reprobe_task):
+            if task is not None:
+                task.cancel()
+        self._invalidation_task = None
+        self._reprobe_task = None
+        self._local.clear()
         if self._client:
             await self._client.close()
             self._client = None
 
 
+class CachePipeline:
+    """
+    RedisCache 的批量操作封装
+
+    写入时批量序列化，读取时批量反序列化，并同步维护 L1 和跨副本失效
+    """
+
+    def __init__(self, cache: RedisCache, client: redis.Redis, pipe):
+        self._cache = cache
+        self._client = client
+        self._pipe = pipe
+        # (操作, 键, L1 值, 过期时间)
+        self._ops: List[Tuple[str, Tuple[str, ...], Any, Optional[int]]] = []
+
+    def get(self, key: str) -> "CachePipeline":
+        self._pipe.get(key)
+        self._ops.append(("get", (key,), None, None))
+        return self
+
+    def set(self, key: str, value: Any, expire_seconds: Optional[int] = None) -> "CachePipeline":
+        local_value = _normalize_value(value)
+        encoded = self._cache.codec.encode(local_value)
+        if expire_seconds:
+            self._pipe.setex(key, expire_seconds, encoded)
+        else:
+            self._pipe.set(key, encoded)
+        self._ops.append(("set", (key,), local_value, expire_seconds))
+        return self
+
+    def delete(self, *keys: str) -> "CachePipeline":
+        if keys:
+            self._pipe.delete(*keys)
+            self._ops.append(("delete", keys, None, None))
+        return self
+
+    async def execute(self) -> Optional[List[Any]]:
+        """
+        发送所有命令
+
+        Returns:
+            每条命令的结果（get 返回反序列化后的值），失败返回 None
+        """
+        cache = self._cache
+        try:
+            raw_results = await self._pipe.execute()
+            cache._record_success()
+        except Exception as e:
+            cache._record_failure(e)
+            logger.warning(f"缓存批量操作失败 ({len(self._ops)} 条命令): {e}")
+            return None
+
+        results = []
+        changed: List[str] = []
+        for (op, keys, local_value, expire_seconds), raw in zip(self._ops, raw_results):
+            if op == "get":
+                results.append(cache.codec.decode(raw) if raw else None)
+            elif op == "set":
+                cache._local.set(keys[0], local_value, cache._local_ttl(expire_seconds))
+                changed.append(keys[0])
+                results.append(bool(raw))
+            else:
+                cache._local.delete(*keys)
+                changed.extend(keys)
+                results.append(raw)
+        self._ops = []
+
+        if changed:
+            await cache._publish_invalidation(self._client, *changed)
+        return results
+
+
 # 全局缓存实例
 _cache_instance: Optional[RedisCache] = None
 
@@ -195,66 +650,154 @@ def init_cache(redis_url: str):
     _cache_instance = RedisCache(redis_url)
 
 
+# 正在进行中的缓存计算（单飞：同一个键同时只计算一次）
+_inflight: Dict[str, asyncio.Future] = {}
+
+# @cached 写入的缓存值包装标记
+_ENVELOPE_MARKER = "__cached__"
+
+
+async def _single_flight(key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    同一个键的并发调用共享一次计算
+
+    使用 shield 保护共享任务，某个调用方被取消不会影响其他等待者
+    """
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(factory())
+        _inflight[key] = future
+
+        def _cleanup(done: asyncio.Future):
+            if _inflight.get(key) is done:
+                del _inflight[key]
+            # 避免无人等待时出现 "exception was never retrieved"
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(_cleanup)
+    return await asyncio.shield(future)
+
+
+def _should_refresh_early(envelope: dict, beta: float) -> bool:
+    """
+    概率提前过期（XFetch）
+
+    越接近过期、计算越慢（delta 越大），越有可能提前刷新，
+    把同一批键的刷新时间打散，避免同时过期
+    """
+    if beta <= 0:
+        return False
+    delta = envelope.get("delta", 0) or 0
+    if delta <= 0:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= envelope["expires_at"]
+
+
 # 缓存装饰器
 def cached(
     key_prefix: str,
     expire_seconds: int = 3600,
-    arg_builder: Optional[Callable] = None
+    arg_builder: Optional[Callable] = None,
+    stale_while_revalidate: int = 0,
+    early_expiration_beta: float = 1.0
 ):
     """
     缓存装饰器
 
+    - 单飞：同一个键并发未命中时，只执行一次被装饰的函数，其余调用等待结果
+    - stale-while-revalidate：过期后的一段时间内先返回旧值，由后台任务刷新
+    - 概率提前过期：临近过期时按概率提前在后台刷新，分散刷新时间
+
     Args:
         key_prefix: 缓存键前缀
         expire_seconds: 过期时间（秒），默认 1 小时
         arg_builder: 自定义键构建函数，接收函数参数返回键的一部分
+        stale_while_revalidate: 过期后仍可返回旧值的时间（秒），0 表示禁用
+        early_expiration_beta: 提前过期系数，越大越早刷新，0 表示禁用
 
     Example:
         @cached("word_lookup", expire_seconds=86400)  # 24 小时
         async def lookup_word(word: str):
             ...
 
-        @cached("scene_objects", expire_seconds=604800)  # 7 天
+        @cached("scene_objects", expire_seconds=604800, stale_while_revalidate=3600)  # 7 天
         async def get_scene_objects(scene_id: int):
             ...
     """
     def decorator(func: Callable):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            # 尝试从缓存获取
-            cache = get_cache()
-            if cache and await cache.is_available():
+        def build_key(*args, **kwargs) -> str:
+            if arg_builder:
+                key_suffix = arg_builder(*args, **kwargs)
+            else:
+                # 默认使用参数字符串
+                key_suffix = "_".join(str(arg) for arg in args)
+                if kwargs:
+                    key_suffix += "_" + "_".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
+            return f"{key_prefix}:{key_suffix}"
+
+        async def compute_and_store(cache: RedisCache, cache_key: str, args, kwargs) -> Any:
+            started = time.monotonic()
+            result = await func(*args, **kwargs)
+            if result is not None:
+                envelope = {
+                    _ENVELOPE_MARKER: 1,
+                    "value": result,
+                    "expires_at": time.time() + expire_seconds,
+                    "delta": time.monotonic() - started,
+                }
+                await cache.set(cache_key, envelope, expire_seconds + stale_while_revalidate)
+            return result
+
+        def refresh_in_background(cache: RedisCache, cache_key: str, args, kwargs):
+            if cache_key in _inflight:
+                return
+
+            async def refresh():
                 try:
-                    # 构建缓存键
-                    if arg_builder:
-                        key_suffix = arg_builder(*args, **kwargs)
-                    else:
-                        # 默认使用参数字符串
-                        key_suffix = "_".join(str(arg) for arg in args)
-                        if kwargs:
-                            key_suffix += "_" + "_".join(f"{k}={v}" for k, v in sorted(kwargs.items()))
-
-                    cache_key = f"{key_prefix}:{key_suffix}"
-
-                    # 尝试从缓存获取
-                    cached_value = await cache.get(cache_key)
-                    if cached_value is not None:
-                        logger.debug(f"缓存命中: {cache_key}")
-                        return cached_value
-
-                    # 缓存未命中，执行函数
-                    logger.debug(f"缓存未命中: {cache_key}")
-                    result = await func(*args, **kwargs)
+                    return await compute_and_store(cache, cache_key, args, kwargs)
+                except Exception as e:
+                    logger.warning(f"后台刷新缓存失败 [{cache_key}]: {e}")
 
-                    # 存入缓存
-                    await cache.set(cache_key, result, expire_seconds)
-                    return result
+            asyncio.ensure_future(_single_flight(cache_key, refresh))
 
-                except Exception as e:
-                    logger.warning(f"缓存操作失败: {e}")
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if not cache or not await cache.is_available():
+                # Redis 不可用，直接执行函数
+                return await func(*args, **kwargs)
 
-            # Redis 不可用或出错，直接执行函数
-            return await func(*args, **kwargs)
+            try:
+                cache_key = build_key(*args, **kwargs)
+                cached_value = await cache.get(cache_key)
+            except Exception as e:
+                logger.warning(f"缓存操作失败: {e}")
+                return await func(*args, **kwargs)
+
+            if cached_value is not None:
+                if not (isinstance(cached_value, dict) and cached_value.get(_ENVELOPE_MARKER)):
+                    # 旧格式的缓存值，直接返回
+                    logger.debug(f"缓存命中: {cache_key}")
+                    return cached_value
+
+                if time.time() >= cached_value["expires_at"]:
+                    # 已过期但仍在 stale-while-revalidate 窗口内：返回旧值，后台刷新
+                    logger.debug(f"缓存过期，返回旧值并后台刷新: {cache_key}")
+                    refresh_in_background(cache, cache_key, args, kwargs)
+                elif _should_refresh_early(cached_value, early_expiration_beta):
+                    logger.debug(f"缓存提前刷新: {cache_key}")
+                    refresh_in_background(cache, cache_key, args, kwargs)
+                else:
+                    logger.debug(f"缓存命中: {cache_key}")
+                return cached_value["value"]
+
+            # 缓存未命中：同一个键只计算一次
+            logger.debug(f"缓存未命中: {cache_key}")
+            return await _single_flight(
+                cache_key,
+                lambda: compute_and_store(cache, cache_key, args, kwargs)
+            )
 
         return wrapper
     return decorator
@@ -284,3 +827,6 @@ class CachePolicy:
 
     # 标签列表缓存（长时间，很少变化）
     TAGS_LIST_TTL = 86400  # 24 小时
+
+    # 单词详情缓存（按 word_id，单词更新时主动失效）
+    WORD_DETAIL_TTL = 86400  # 24 小时
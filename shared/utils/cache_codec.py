@@ -0,0 +1,164 @@
+"""
+缓存值编解码
+为 Redis 中的缓存值提供可插拔的序列化格式
+
+编码后的值以 1 个头字节开头，标识序列化格式和压缩方式：
+- 0x01: msgpack
+- 0x02: msgpack + zlib
+- 0x03: msgpack + lz4
+- 0x11: JSON (UTF-8)
+- 0x12: JSON + zlib
+- 0x13: JSON + lz4
+没有头字节的值视为旧格式（JSON 文本或普通字符串），读取时保持兼容
+"""
+import os
+import json
+import zlib
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 可选依赖
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 取决于部署环境
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - 取决于部署环境
+    lz4_frame = None
+
+# 编解码配置
+CACHE_CODEC = os.getenv("CACHE_CODEC", "msgpack")  # msgpack 或 json
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")  # zlib, lz4 或 none
+# 超过该字节数才压缩（小值压缩收益低，反而浪费 CPU）
+CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", "1024"))
+
+FORMAT_MSGPACK = 0x01
+FORMAT_JSON = 0x11
+COMPRESSION_NONE = 0x00
+COMPRESSION_ZLIB = 0x01
+COMPRESSION_LZ4 = 0x02
+
+_COMPRESSION_IDS = {
+    "none": COMPRESSION_NONE,
+    "zlib": COMPRESSION_ZLIB,
+    "lz4": COMPRESSION_LZ4,
+}
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def _compress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.compress(data, 1)
+    if compression == COMPRESSION_LZ4:
+        return lz4_frame.compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(data)
+    if compression == COMPRESSION_LZ4:
+        if lz4_frame is None:
+            raise ValueError("lz4 is not installed, cannot decode cached value")
+        return lz4_frame.decompress(data)
+    return data
+
+
+_SERIALIZERS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    FORMAT_JSON: (_json_dumps, _json_loads),
+}
+if msgpack is not None:
+    _SERIALIZERS[FORMAT_MSGPACK] = (_msgpack_dumps, _msgpack_loads)
+
+
+class CacheCodec:
+    """缓存值编解码器"""
+
+    def __init__(
+        self,
+        codec: str = CACHE_CODEC,
+        compression: str = CACHE_COMPRESSION,
+        compress_threshold: int = CACHE_COMPRESS_THRESHOLD
+    ):
+        """
+        Args:
+            codec: 序列化格式，msgpack 或 json（未安装 msgpack 时自动退回 json）
+            compression: 压缩方式，zlib、lz4 或 none（未安装 lz4 时自动退回 zlib）
+            compress_threshold: 超过该字节数才压缩
+        """
+        if codec == "msgpack" and msgpack is None:
+            logger.warning("msgpack 未安装，缓存编码退回 JSON")
+            codec = "json"
+        if compression == "lz4" and lz4_frame is None:
+            logger.warning("lz4 未安装，缓存压缩退回 zlib")
+            compression = "zlib"
+
+        self.format = FORMAT_MSGPACK if codec == "msgpack" else FORMAT_JSON
+        self.compression = _COMPRESSION_IDS.get(compression, COMPRESSION_NONE)
+        self.compress_threshold = compress_threshold
+        self._dumps = _SERIALIZERS[self.format][0]
+
+    def encode(self, value: Any) -> bytes:
+        """序列化为带头字节的二进制"""
+        data = self._dumps(value)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(data) > self.compress_threshold:
+            compressed = _compress(data, self.compression)
+            if len(compressed) < len(data):
+                data = compressed
+                compression = self.compression
+        return bytes((self.format + compression,)) + data
+
+    def decode(self, raw: Optional[bytes]) -> Any:
+        """反序列化，兼容没有头字节的旧格式"""
+        if raw is None:
+            return None
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+
+        if raw:
+            header = raw[0]
+            for fmt in (FORMAT_MSGPACK, FORMAT_JSON):
+                compression = header - fmt
+                if compression in (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZ4):
+                    if fmt not in _SERIALIZERS:
+                        raise ValueError("msgpack is not installed, cannot decode cached value")
+                    loads = _SERIALIZERS[fmt][1]
+                    return loads(_decompress(raw[1:], compression))
+
+        # 旧格式：JSON 文本或普通字符串
+        text = raw.decode("utf-8")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text
+
+
+_default_codec: Optional[CacheCodec] = None
+
+
+def get_codec() -> CacheCodec:
+    """获取默认编解码器（按环境变量配置，单例）"""
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = CacheCodec()
+    return _default_codec
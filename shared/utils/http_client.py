@@ -0,0 +1,288 @@
+"""
+共享 HTTP 客户端
+为第三方 API 调用（语音识别、词典、音频下载等）提供按名称区分的长连接 httpx.AsyncClient
+
+每个名称对应一个上游主机，拥有独立的连接池上限、超时和重试策略，
+同一主机的请求复用 TCP 连接和 TLS 会话，不再每次调用都重新握手。
+客户端在首次使用时创建，应用关闭时统一释放。
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 每个客户端（即每个上游主机）的连接池上限
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "60"))
+# 建立连接和等待连接池空闲连接的超时（秒）
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+HTTP_CLIENT_POOL_TIMEOUT = float(os.getenv("HTTP_CLIENT_POOL_TIMEOUT", "10"))
+# 重试策略：最大重试次数和指数退避的基础间隔（秒）
+HTTP_CLIENT_RETRIES = int(os.getenv("HTTP_CLIENT_RETRIES", "2"))
+HTTP_CLIENT_RETRY_BACKOFF = float(os.getenv("HTTP_CLIENT_RETRY_BACKOFF", "0.2"))
+# Retry-After 响应头允许的最长等待时间（秒），超过则不再重试
+HTTP_CLIENT_RETRY_AFTER_MAX = float(os.getenv("HTTP_CLIENT_RETRY_AFTER_MAX", "5"))
+
+
+def _parse_timeouts(value: str) -> Dict[str, float]:
+    """解析 "groq:60,mymemory:3" 格式的客户端超时覆盖配置"""
+    timeouts = {}
+    for item in value.split(","):
+        if ":" in item:
+            name, timeout = item.split(":", 1)
+            timeouts[name.strip()] = float(timeout)
+    return timeouts
+
+
+# 按客户端名称覆盖读写超时（秒）
+HTTP_CLIENT_TIMEOUTS = _parse_timeouts(os.getenv("HTTP_CLIENT_TIMEOUTS", ""))
+
+# 幂等方法：服务端返回可重试状态码或读取失败时才会整体重发
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+class HttpClientConfig(NamedTuple):
+    """单个命名客户端的配置"""
+    timeout: float = 30.0
+    max_connections: int = HTTP_CLIENT_MAX_CONNECTIONS
+    max_keepalive_connections: int = HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS
+    retries: int = HTTP_CLIENT_RETRIES
+    # 允许按状态码重试的方法；连接失败（请求尚未发出）对所有方法都会重试
+    retry_methods: FrozenSet[str] = IDEMPOTENT_METHODS
+    retry_statuses: FrozenSet[int] = RETRY_STATUS_CODES
+
+
+# 内置客户端：按上游主机划分，保证一个慢主机不会占满其他主机的连接
+DEFAULT_HTTP_CLIENTS: Dict[str, HttpClientConfig] = {
+    "groq": HttpClientConfig(timeout=60.0),
+    "openai": HttpClientConfig(timeout=60.0),
+    "deepinfra": HttpClientConfig(timeout=60.0),
+    "youdao": HttpClientConfig(timeout=5.0),
+    "mymemory": HttpClientConfig(timeout=3.0),
+    # 下载用户提供的音频 URL，目标主机不固定
+    "download": HttpClientConfig(timeout=30.0),
+}
+
+
+class HttpClientStats:
+    """单个命名客户端的运行指标"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests_total = 0
+        self.retries = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.latency_total = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "retries": self.retries,
+            "errors": self.errors,
+            "connections_opened": self.connections_opened,
+            "latency_avg_ms": round(
+                self.latency_total / self.requests_total * 1000, 3
+            ) if self.requests_total else 0.0,
+        }
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> Optional[float]:
+    """
+    计算第 attempt 次重试前的等待时间
+
+    优先使用服务端的 Retry-After（秒数形式），否则按指数退避加随机抖动；
+    Retry-After 超过上限时返回 None，表示不再重试
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                delay = None
+            if delay is not None:
+                return delay if delay <= HTTP_CLIENT_RETRY_AFTER_MAX else None
+    base = HTTP_CLIENT_RETRY_BACKOFF * (2 ** attempt)
+    return base + random.uniform(0, base)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    """
+    带重试策略的传输层
+
+    - 连接失败（请求未发出）：所有方法都重试，由底层 httpcore 完成
+    - 可重试状态码或读取失败：只重试幂等方法，避免重复提交非幂等请求
+    """
+
+    def __init__(self, config: HttpClientConfig, stats: HttpClientStats):
+        self.config = config
+        self.stats = stats
+        self._transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+            ),
+            retries=config.retries,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        retryable = request.method in self.config.retry_methods
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                stats.connections_opened += 1
+
+        request.extensions = {**request.extensions, "trace": trace}
+        stats.in_flight += 1
+        stats.requests_total += 1
+        started = time.perf_counter()
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = await self._transport.handle_async_request(request)
+                except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                    if not retryable or attempt >= self.config.retries:
+                        stats.errors += 1
+                        raise
+                    delay = _retry_delay(attempt)
+                except httpx.TransportError:
+                    stats.errors += 1
+                    raise
+                else:
+                    if (
+                        not retryable
+                        or response.status_code not in self.config.retry_statuses
+                        or attempt >= self.config.retries
+                    ):
+                        return response
+                    delay = _retry_delay(attempt, response)
+                    if delay is None:
+                        return response
+                    await response.aclose()
+
+                attempt += 1
+                stats.retries += 1
+                logger.debug(f"Retrying {request.method} {request.url.host} (attempt {attempt}) in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        finally:
+            stats.in_flight -= 1
+            stats.latency_total += time.perf_counter() - started
+
+    def pool_connections(self) -> list:
+        """读取 httpcore 连接池中的连接列表"""
+        pool = getattr(self._transport, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HttpClientRegistry:
+    """
+    命名 HTTP 客户端注册表
+
+    get() 在首次使用时创建客户端（脚本或未接入生命周期的调用方也能使用），
+    应用启动时 start() 预先创建所有已注册的客户端，关闭时 close() 统一释放连接。
+    """
+
+    def __init__(self, configs: Optional[Dict[str, HttpClientConfig]] = None):
+        self._configs: Dict[str, HttpClientConfig] = dict(configs or {})
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, RetryTransport] = {}
+        self._stats: Dict[str, HttpClientStats] = {}
+
+    def register(self, name: str, config: HttpClientConfig):
+        """注册（或替换尚未创建的）命名客户端配置"""
+        if name in self._clients:
+            raise RuntimeError(f"HTTP client {name} is already started")
+        self._configs[name] = config
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        config = self._configs.get(name)
+        if config is None:
+            raise KeyError(f"HTTP client {name} is not registered")
+        stats = self._stats.setdefault(name, HttpClientStats())
+        transport = RetryTransport(config, stats)
+        timeout = httpx.Timeout(
+            HTTP_CLIENT_TIMEOUTS.get(name, config.timeout),
+            connect=HTTP_CLIENT_CONNECT_TIMEOUT,
+            pool=HTTP_CLIENT_POOL_TIMEOUT,
+        )
+        client = httpx.AsyncClient(transport=transport, timeout=timeout)
+        self._transports[name] = transport
+        self._clients[name] = client
+        logger.info(f"HTTP client created: {name} (timeout={timeout.read}s, max_connections={config.max_connections})")
+        return client
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """获取命名客户端（不存在时创建）"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create(name)
+        return client
+
+    async def start(self):
+        """创建所有已注册的客户端"""
+        for name in self._configs:
+            self.get(name)
+
+    async def close(self):
+        """关闭所有客户端，释放连接"""
+        for name, client in self._clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {name}: {e}")
+        self._clients.clear()
+        self._transports.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个客户端的连接池和请求指标"""
+        result = {}
+        for name, stats in self._stats.items():
+            transport = self._transports.get(name)
+            connections = transport.pool_connections() if transport else []
+            idle = sum(1 for conn in connections if conn.is_idle())
+            result[name] = {
+                "active": len(connections) - idle,
+                "idle": idle,
+                **stats.snapshot(),
+            }
+        return result
+
+
+# 全局注册表
+http_clients = HttpClientRegistry(DEFAULT_HTTP_CLIENTS)
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """获取命名的共享 HTTP 客户端"""
+    return http_clients.get(name)
+
+
+def register_http_client(name: str, config: HttpClientConfig):
+    """注册自定义命名客户端"""
+    http_clients.register(name, config)
+
+
+async def start_http_clients():
+    """应用启动时调用"""
+    await http_clients.start()
+
+
+async def close_http_clients():
+    """应用关闭时调用"""
+    await http_clients.close()
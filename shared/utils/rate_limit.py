@@ -2,21 +2,237 @@
 请求限流中间件
 防止 API 滥用，基于用户 ID 或 IP 地址进行限流
 """
+import os
+import math
 import time
+import wave
+import asyncio
+import inspect
 import logging
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from fastapi import Request, HTTPException, status
-from functools import wraps
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from functools import lru_cache, wraps
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时按字节数计费
+    Image = None
 
 logger = logging.getLogger(__name__)
 
+# 限流模式：
+# - local: 进程内令牌桶判断，后台定期与 Redis 批量同步（近似全局限流，无逐请求网络开销）
+# - redis: 每个请求都在 Redis 中原子判断（严格全局限流）
+# 两种模式在 Redis 不可用时都退回进程内令牌桶，按单实例限额继续限流
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "local")
+# 进程内令牌桶最多保留的键数量，超出时淘汰最久未使用的键
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+# 与 Redis 同步的间隔（秒）和单次脚本调用的最大键数
+RATE_LIMIT_SYNC_INTERVAL = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "1"))
+RATE_LIMIT_SYNC_BATCH = int(os.getenv("RATE_LIMIT_SYNC_BATCH", "500"))
+
+# 服务前方可信反向代理的层数，用于从 X-Forwarded-For 中取出客户端 IP
+# 默认 0：直接使用连接对端地址（不信任 X-Forwarded-For）。服务部署在反向代理或网关之后时
+# 必须按实际层数设置，否则所有用户都按代理的 IP 计入同一个限流桶（zeabur.yaml 已配置）
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+# 加权限流：昂贵请求按资源消耗折算配额（1 个配额单位对应的资源量）
+RATE_LIMIT_COST_BYTES = int(os.getenv("RATE_LIMIT_COST_BYTES", str(1024 * 1024)))  # 1 MB
+RATE_LIMIT_COST_PIXELS = int(os.getenv("RATE_LIMIT_COST_PIXELS", str(2 * 1000 * 1000)))  # 2 百万像素
+RATE_LIMIT_COST_AUDIO_SECONDS = float(os.getenv("RATE_LIMIT_COST_AUDIO_SECONDS", "10"))  # 10 秒音频
+
+
+def _parse_tier_multipliers(value: str) -> Dict[str, float]:
+    """解析 "anonymous:0.5,registered:1" 格式的用户等级配额倍数"""
+    multipliers = {}
+    for item in value.split(","):
+        if ":" in item:
+            tier, multiplier = item.split(":", 1)
+            multipliers[tier.strip()] = float(multiplier)
+    return multipliers
+
+
+# 各用户等级的配额倍数（相对于端点声明的 max_requests）
+RATE_LIMIT_TIER_MULTIPLIERS = _parse_tier_multipliers(
+    os.getenv("RATE_LIMIT_TIER_MULTIPLIERS", "anonymous:0.5,registered:1")
+)
+
+
+# GCRA（通用信元速率算法，等价于令牌桶）限流脚本
+# 每个键只保存一个"理论到达时间"(TAT)，判断和更新在 Redis 端原子完成，
+# 一次往返同时返回 是否允许 / 剩余次数 / 重置时间 / 重试等待时间
+# 使用 Redis 服务器时间，避免多个副本之间的时钟偏差
+_GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = period / limit
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + cost * interval
+local allow_at = new_tat - period
+if allow_at > now then
+    local remaining = math.floor((period - (tat - now)) / interval)
+    return {0, remaining, math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+local remaining = math.floor((period - (new_tat - now)) / interval)
+return {1, remaining, math.ceil(new_tat - now), 0}
+"""
+
+
+# 批量同步脚本：把各键在本地已消耗的配额记入 Redis 中的 TAT，
+# 返回每个键的全局剩余配额（可能为负，表示其他副本已用超）
+# 参数按键依次为 limit, period(ms), cost
+_SYNC_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local results = {}
+for i, key in ipairs(KEYS) do
+    local base = (i - 1) * 3
+    local limit = tonumber(ARGV[base + 1])
+    local period = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+    local interval = period / limit
+
+    local tat = tonumber(redis.call('GET', key))
+    if not tat or tat < now then
+        tat = now
+    end
+    if cost > 0 then
+        -- 本地已放行的请求无法撤回，只累计欠账，最多记两个窗口
+        tat = math.min(tat + cost * interval, now + 2 * period)
+        redis.call('SET', key, tostring(tat), 'PX', math.ceil(tat - now))
+    end
+    results[i] = math.floor((period - (tat - now)) / interval)
+end
+return results
+"""
+
+
+class RateLimitResult(NamedTuple):
+    """单次限流判断结果"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # 配额完全恢复还需的秒数
+    reset_after: float
+    # 被拒绝时需要等待的秒数，允许时为 0
+    retry_after: float
+    # 本次请求消耗的配额
+    cost: int = 1
+
+    @property
+    def headers(self) -> dict:
+        """X-RateLimit-* 响应头"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, self.remaining)),
+            "X-RateLimit-Reset": str(int(time.time() + self.reset_after)),
+        }
+        if self.cost != 1:
+            headers["X-RateLimit-Cost"] = str(self.cost)
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, int(self.retry_after + 0.999)))
+        return headers
+
+
+class _TokenBucket:
+    """进程内令牌桶"""
+
+    __slots__ = ("limit", "period", "tokens", "updated", "last_hit", "pending")
+
+    def __init__(self, limit: int, period: float, now: float):
+        self.limit = limit
+        self.period = period
+        self.tokens = float(limit)
+        self.updated = now
+        self.last_hit = now
+        # 尚未同步到 Redis 的消耗
+        self.pending = 0
+
+    def refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(float(self.limit), self.tokens + elapsed * self.limit / self.period)
+            self.updated = now
+
+    def resize(self, limit: int, period: float, now: float):
+        """
+        按新的限额调整令牌桶（如用户等级变化）
+
+        原地修改而不是新建令牌桶：已消耗的配额和尚未同步到 Redis 的 pending 都保留，
+        正在进行的同步持有的引用也仍然有效
+        """
+        self.refill(now)
+        consumed = self.limit - self.tokens
+        self.limit = limit
+        self.period = period
+        self.tokens = max(0.0, float(limit) - consumed)
+
+    def take(self, cost: int, now: float) -> RateLimitResult:
+        self.refill(now)
+        self.last_hit = now
+        rate = self.limit / self.period
+        allowed = self.tokens >= cost
+        if allowed:
+            self.tokens -= cost
+        retry_after = 0 if allowed else (cost - self.tokens) / rate
+        return RateLimitResult(
+            allowed,
+            self.limit,
+            int(self.tokens),
+            (self.limit - self.tokens) / rate,
+            retry_after,
+            cost
+        )
+
 
 class RateLimiter:
-    """基于 Redis 的限流器"""
+    """
+    两级限流器
 
-    def __init__(self):
-        """初始化限流器"""
+    - 进程内令牌桶：按 LRU 保留有限数量的键，判断不经过网络
+    - Redis GCRA：多个副本共享的全局状态，定期批量同步或逐请求原子判断
+    """
+
+    def __init__(
+        self,
+        mode: str = RATE_LIMIT_MODE,
+        max_local_keys: int = RATE_LIMIT_LOCAL_MAX_KEYS,
+        sync_interval: float = RATE_LIMIT_SYNC_INTERVAL
+    ):
+        """
+        初始化限流器
+
+        Args:
+            mode: local（本地判断 + 定期同步）或 redis（逐请求原子判断）
+            max_local_keys: 进程内令牌桶最大键数
+            sync_interval: 与 Redis 同步的间隔（秒）
+        """
         self._cache = None
+        self.mode = mode
+        self.max_local_keys = max_local_keys
+        self.sync_interval = sync_interval
+        self._buckets: "OrderedDict[str, _TokenBucket]" = OrderedDict()
+        # 被淘汰但尚未同步的消耗：{键: (limit, period, cost)}
+        self._evicted: Dict[str, tuple] = {}
+        self._sync_task: Optional[asyncio.Task] = None
 
     async def _get_cache(self):
         """获取缓存客户端（懒加载）"""
@@ -28,110 +244,218 @@ class RateLimiter:
                 logger.warning(f"获取缓存客户端失败: {e}")
         return self._cache
 
-    async def is_allowed(
+    def _bucket(self, key: str, max_requests: int, window_seconds: int, now: float) -> _TokenBucket:
+        """获取（或创建）进程内令牌桶，超出容量时淘汰最久未使用的键"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _TokenBucket(max_requests, window_seconds, now)
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_local_keys:
+                evicted_key, evicted = self._buckets.popitem(last=False)
+                if evicted.pending:
+                    self._evicted[evicted_key] = (evicted.limit, evicted.period, evicted.pending)
+        else:
+            if bucket.limit != max_requests or bucket.period != window_seconds:
+                bucket.resize(max_requests, window_seconds, now)
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _ensure_sync_task(self):
+        """启动后台同步任务（需要在事件循环中调用）"""
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def _sync_loop(self):
+        """定期把本地消耗批量同步到 Redis，并用全局剩余配额校正本地令牌"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"限流状态同步失败: {e}")
+
+    async def sync(self):
+        """与 Redis 同步一次"""
+        cache = await self._get_cache()
+        if not cache:
+            return
+
+        # 同步有未上报消耗或最近一个窗口内被访问过的键（需要感知其他副本的消耗）
+        now = time.monotonic()
+        batch = [
+            (key, bucket.limit, bucket.period, bucket.pending, bucket)
+            for key, bucket in self._buckets.items()
+            if bucket.pending or now - bucket.last_hit < bucket.period
+        ]
+        batch.extend((key, limit, period, cost, None) for key, (limit, period, cost) in self._evicted.items())
+        self._evicted = {}
+
+        for start in range(0, len(batch), RATE_LIMIT_SYNC_BATCH):
+            chunk = batch[start:start + RATE_LIMIT_SYNC_BATCH]
+            args: List[int] = []
+            for _, limit, period, cost, bucket in chunk:
+                args.extend((limit, int(period * 1000), cost))
+                if bucket is not None:
+                    bucket.pending -= cost
+
+            results = await cache.run_script(
+                _SYNC_SCRIPT,
+                keys=[f"rate_limit:{key}" for key, *_ in chunk],
+                args=args
+            )
+
+            if results is None:
+                # Redis 不可用：把消耗放回，下次再同步
+                for key, limit, period, cost, bucket in chunk:
+                    if bucket is not None:
+                        bucket.pending += cost
+                    elif cost:
+                        self._evicted[key] = (limit, period, cost)
+                continue
+
+            now = time.monotonic()
+            for (_, _, _, _, bucket), remaining in zip(chunk, results):
+                if bucket is not None:
+                    # 同步期间本地新增的消耗还未计入全局剩余
+                    bucket.refill(now)
+                    bucket.tokens = max(0.0, min(bucket.tokens, float(int(remaining) - bucket.pending)))
+
+    async def hit(
         self,
         key: str,
         max_requests: int,
-        window_seconds: int
-    ) -> bool:
+        window_seconds: int,
+        cost: int = 1
+    ) -> RateLimitResult:
         """
-        检查是否允许请求
+        消耗一次配额并返回限流结果
 
         Args:
             key: 限流键（如 user_id 或 IP）
             max_requests: 时间窗口内最大请求数
             window_seconds: 时间窗口（秒）
+            cost: 本次请求消耗的配额
 
         Returns:
-            是否允许请求
+            RateLimitResult
         """
         cache = await self._get_cache()
+        now = time.monotonic()
 
-        if not cache or not await cache.is_available():
-            # Redis 不可用时不限流
-            return True
-
-        try:
-            cache_key = f"rate_limit:{key}"
-            current = await cache.get(cache_key)
-
-            if current is None:
-                # 首次请求
-                await cache.set(cache_key, 1, window_seconds)
-                return True
-
-            # 检查是否超过限制
-            if isinstance(current, int) and current >= max_requests:
-                logger.warning(f"请求限流触发: {key} (已请求 {current}/{max_requests})")
-                return False
-
-            # 增加计数
-            await cache.set(cache_key, current + 1, window_seconds)
-            return True
-
-        except Exception as e:
-            logger.warning(f"限流检查失败: {e}")
-            # 出错时不限流
-            return True
+        if self.mode == "redis" and cache:
+            result = await cache.run_script(
+                _GCRA_SCRIPT,
+                keys=[f"rate_limit:{key}"],
+                args=[max_requests, window_seconds * 1000, cost]
+            )
+            if result:
+                allowed, remaining, reset_ms, retry_ms = (int(v) for v in result)
+                if not allowed:
+                    logger.warning(f"请求限流触发: {key} (限制 {max_requests}/{window_seconds}s)")
+                return RateLimitResult(
+                    bool(allowed), max_requests, remaining, reset_ms / 1000, retry_ms / 1000, cost
+                )
+            # Redis 不可用时退回进程内令牌桶，按单实例限额继续限流
+            return self._bucket(key, max_requests, window_seconds, now).take(cost, now)
+
+        bucket = self._bucket(key, max_requests, window_seconds, now)
+        result = bucket.take(cost, now)
+        if result.allowed:
+            bucket.pending += cost
+        else:
+            logger.warning(f"请求限流触发: {key} (限制 {max_requests}/{window_seconds}s)")
+
+        if cache:
+            self._ensure_sync_task()
+        return result
+
+    def local_stats(self) -> dict:
+        """进程内令牌桶统计"""
+        return {
+            "mode": self.mode,
+            "keys": len(self._buckets),
+            "max_keys": self.max_local_keys,
+            "pending_keys": sum(1 for bucket in self._buckets.values() if bucket.pending) + len(self._evicted),
+        }
 
-    async def get_remaining_requests(
+    async def is_allowed(
         self,
-        key: str
-    ) -> Optional[int]:
+        key: str,
+        max_requests: int,
+        window_seconds: int
+    ) -> bool:
         """
-        获取剩余请求数
+        检查是否允许请求
 
         Args:
-            key: 限流键
+            key: 限流键（如 user_id 或 IP）
+            max_requests: 时间窗口内最大请求数
+            window_seconds: 时间窗口（秒）
 
         Returns:
-            剩余请求数，如果无法获取返回 None
+            是否允许请求
         """
-        cache = await self._get_cache()
-
-        if not cache or not await cache.is_available():
-            return None
-
-        try:
-            cache_key = f"rate_limit:{key}"
-            current = await cache.get(cache_key)
-            return current
-        except Exception:
-            return None
+        result = await self.hit(key, max_requests, window_seconds)
+        return result.allowed
 
 
 # 全局限流器实例
 _rate_limiter = RateLimiter()
 
 
+def get_rate_limiter() -> RateLimiter:
+    """获取全局限流器实例"""
+    return _rate_limiter
+
+
+# 限流装饰器向端点签名追加的子响应参数名
+_RESPONSE_PARAM = "rate_limit_response"
+
+
 def rate_limit(
     max_requests: int = 60,
     window_seconds: int = 60,
-    key_func: Optional[callable] = None
+    key_func: Optional[callable] = None,
+    cost_func: Optional[Callable[[Request, dict], int]] = None,
+    tier_multipliers: Optional[Dict[str, float]] = None
 ):
     """
     请求限流装饰器
 
     Args:
-        max_requests: 时间窗口内最大请求数（默认 60 次/分钟）
+        max_requests: 时间窗口内最大请求数（默认 60 次/分钟）；
+            使用 cost_func 时为时间窗口内的配额总数
         window_seconds: 时间窗口（秒，默认 60 秒）
         key_func: 自定义键生成函数，接收 Request 返回限流键
+        cost_func: 请求消耗的配额，接收 (Request, 端点参数) 返回整数
+        tier_multipliers: {用户等级: 配额倍数}，按用户等级调整 max_requests；
+            只对声明了 current_user 参数的端点生效，无法识别用户的端点不按等级调整
 
     Example:
         @app.get("/api/endpoint")
         @rate_limit(max_requests=10, window_seconds=60)
-        async def endpoint():
+        async def endpoint(request: Request):
             return {"message": "Hello"}
 
-        # 限制特定用户
-        @app.get("/api/premium")
-        @rate_limit(max_requests=1000, window_seconds=60)
-        async def premium_endpoint():
-            return {"message": "Premium"}
+        # 按上传文件大小/像素/音频时长计费
+        @app.post("/api/upload")
+        @rate_limit(max_requests=30, window_seconds=60, cost_func=estimate_upload_cost)
+        async def upload(request: Request, file: UploadFile = File(...)):
+            return {"message": "OK"}
     """
     def decorator(func: callable):
+        signature = inspect.signature(func)
+        # 端点没有注入 current_user 时无法区分匿名和注册用户，不按等级调整配额
+        tiered = bool(tier_multipliers) and 'current_user' in signature.parameters
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            # FastAPI 注入的子响应，用于写入限流响应头（端点本身不接收此参数）
+            response: Optional[Response] = kwargs.pop(_RESPONSE_PARAM, None)
+            result = None
+
             # 尝试从参数中获取 Request
             request = None
             for arg in args:
@@ -149,19 +473,29 @@ def rate_limit(
                     limit_key = key_func(request)
                 else:
                     # 默认使用用户 ID（如果已认证）或 IP 地址
-                    limit_key = _get_default_key(request)
+                    limit_key = _get_default_key(request, kwargs.get('current_user'))
+
+                limit = max_requests
+                if tiered:
+                    tier = _get_user_tier(kwargs.get('current_user'))
+                    limit = max(1, int(max_requests * tier_multipliers.get(tier, 1)))
+
+                cost = 1
+                if cost_func:
+                    limit_key = f"cost:{limit_key}"
+                    # 单次请求最多消耗全部配额，否则永远无法通过
+                    cost = min(max(1, cost_func(request, kwargs)), limit)
 
                 # 检查是否允许请求
-                allowed = await _rate_limiter.is_allowed(
+                result = await _rate_limiter.hit(
                     limit_key,
-                    max_requests,
-                    window_seconds
+                    limit,
+                    window_seconds,
+                    cost
                 )
 
-                if not allowed:
-                    # 获取剩余时间
-                    remaining = await _rate_limiter.get_remaining_requests(limit_key)
-                    retry_after = window_seconds
+                if not result.allowed:
+                    retry_after = int(result.headers["Retry-After"])
 
                     raise HTTPException(
                         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
@@ -170,27 +504,117 @@ def rate_limit(
                             "message": f"请求过于频繁，请在 {retry_after} 秒后重试",
                             "retry_after": retry_after
                         },
-                        headers={
-                            "Retry-After": str(retry_after),
-                            "X-RateLimit-Limit": str(max_requests),
-                            "X-RateLimit-Remaining": "0",
-                            "X-RateLimit-Reset": str(int(time.time()) + retry_after)
-                        }
+                        headers=result.headers
                     )
 
-                # 添加限流信息到响应头
-                remaining_count = await _rate_limiter.get_remaining_requests(limit_key)
-                if remaining_count is not None:
-                    # 这里无法直接修改响应头，需要在 middleware 层处理
-                    pass
-
-            return await func(*args, **kwargs)
-
+            returned = await func(*args, **kwargs)
+
+            if result is not None:
+                # 端点直接返回 Response 时 FastAPI 不合并子响应的头，直接写到返回的响应上
+                target = returned if isinstance(returned, Response) else response
+                if target is not None:
+                    target.headers.update(result.headers)
+            return returned
+
+        # 在签名中追加一个 Response 参数，让 FastAPI 注入子响应（需位于 **kwargs 之前）
+        parameters = list(signature.parameters.values())
+        position = len(parameters)
+        if parameters and parameters[-1].kind == inspect.Parameter.VAR_KEYWORD:
+            position -= 1
+        parameters.insert(
+            position,
+            inspect.Parameter(_RESPONSE_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Response)
+        )
+        wrapper.__signature__ = signature.replace(parameters=parameters)
         return wrapper
     return decorator
 
 
-def _get_default_key(request: Request) -> str:
+def _get_user_tier(user) -> str:
+    """用户等级：未登录或匿名用户为 anonymous，其余为 registered"""
+    if user is None or getattr(user, 'is_anonymous', False):
+        return "anonymous"
+    return "registered"
+
+
+def _upload_audio_seconds(upload: UploadFile) -> Optional[float]:
+    """读取 WAV 头获取音频时长，其他格式返回 None"""
+    if not (upload.content_type or "").startswith("audio/"):
+        return None
+    try:
+        upload.file.seek(0)
+        with wave.open(upload.file, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        return None
+    finally:
+        upload.file.seek(0)
+
+
+def _upload_pixels(upload: UploadFile) -> Optional[int]:
+    """读取图片头获取像素数（只解析文件头，不解码图片）"""
+    if Image is None or not (upload.content_type or "").startswith("image/"):
+        return None
+    try:
+        upload.file.seek(0)
+        with Image.open(upload.file) as image:
+            width, height = image.size
+        return width * height
+    except Exception:
+        return None
+    finally:
+        upload.file.seek(0)
+
+
+def _upload_size(upload: UploadFile) -> int:
+    """上传文件字节数"""
+    if upload.size is not None:
+        return upload.size
+    position = upload.file.tell()
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(position)
+    return size
+
+
+def estimate_upload_cost(request: Request, params: dict) -> int:
+    """
+    按上传内容估算请求消耗的配额
+
+    音频优先按时长、图片优先按像素数计费，无法获取时按字节数计费；
+    没有上传文件时按请求体大小计费，最少 1 个配额
+
+    Args:
+        request: 请求对象
+        params: 端点参数（FastAPI 已解析的表单和文件）
+
+    Returns:
+        配额数
+    """
+    units = 0.0
+    uploads = [value for value in params.values() if isinstance(value, UploadFile)]
+
+    for upload in uploads:
+        seconds = _upload_audio_seconds(upload)
+        if seconds is not None:
+            units += seconds / RATE_LIMIT_COST_AUDIO_SECONDS
+            continue
+        pixels = _upload_pixels(upload)
+        if pixels is not None:
+            units += pixels / RATE_LIMIT_COST_PIXELS
+            continue
+        units += _upload_size(upload) / RATE_LIMIT_COST_BYTES
+
+    if not uploads:
+        try:
+            units = int(request.headers.get("content-length", "0")) / RATE_LIMIT_COST_BYTES
+        except ValueError:
+            units = 0
+
+    return max(1, math.ceil(units))
+
+
+def _get_default_key(request: Request, user=None) -> str:
     """
     生成默认限流键
 
@@ -198,66 +622,135 @@ def _get_default_key(request: Request) -> str:
     1. 用户 ID（如果已认证）
     2. IP 地址
     """
+    # 端点依赖注入的当前用户
+    if user is not None and getattr(user, 'user_id', None) is not None:
+        return f"user:{user.user_id}"
+
     # 尝试从请求状态中获取用户信息
     if hasattr(request.state, 'user') and request.state.user:
         return f"user:{request.state.user.user_id}"
 
     # 使用 IP 地址
-    # 获取真实 IP（考虑代理）
-    forwarded = request.headers.get('X-Forwarded-For')
-    if forwarded:
-        ip = forwarded.split(',')[0].strip()
-    else:
-        ip = request.client.host if request.client else 'unknown'
+    return f"ip:{_get_client_ip(request)}"
 
-    return f"ip:{ip}"
+
+def _get_client_ip(request: Request) -> str:
+    """
+    获取客户端 IP
+
+    X-Forwarded-For 最左侧的条目由客户端任意填写，不能用作限流键；
+    只信任最右侧 RATE_LIMIT_TRUSTED_PROXIES 个由己方代理追加的地址，
+    取这些代理之前的一跳。未配置可信代理时直接使用连接对端地址
+    """
+    peer = request.client.host if request.client else 'unknown'
+    if RATE_LIMIT_TRUSTED_PROXIES <= 0:
+        return peer
+
+    forwarded = ','.join(request.headers.getlist('X-Forwarded-For'))
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+    hops.append(peer)
+    return hops[max(0, len(hops) - 1 - RATE_LIMIT_TRUSTED_PROXIES)]
+
+
+def _normalize_path(path: str) -> str:
+    """统一路径大小写并去掉尾部斜杠，用于匹配路由策略"""
+    return path.lower().rstrip("/") or "/"
 
 
 class RateLimitMiddleware:
     """
-    请求限流中间件（全局应用）
+    请求限流中间件（纯 ASGI，不缓冲请求体和响应体）
+
+    按路由选择 RateLimitPolicy 中的策略：route_policies 按最长前缀匹配，
+    每个前缀单独计数（上传照片不会占用语音识别的配额）；
+    未匹配的请求按方法归类（GET/HEAD 为 read_policy，其余为 write_policy），每个类别单独计数
 
     在 FastAPI 应用中添加：
-    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(
+        RateLimitMiddleware,
+        route_policies={"/login": "AUTH", "/photo/recognize": "EXPENSIVE"}
+    )
     """
 
     def __init__(
         self,
-        max_requests: int = 60,
-        window_seconds: int = 60,
-        exclude_paths: Optional[list] = None
+        app: ASGIApp,
+        max_requests: Optional[int] = None,
+        window_seconds: Optional[int] = None,
+        exclude_paths: Optional[list] = None,
+        route_policies: Optional[Dict[str, str]] = None,
+        key_func: Optional[Callable[[Request], str]] = None,
+        read_policy: str = "API_QUERY",
+        write_policy: str = "WRITE_OPERATION"
     ):
         """
         初始化中间件
 
         Args:
-            max_requests: 时间窗口内最大请求数
-            window_seconds: 时间窗口（秒）
+            app: 下游 ASGI 应用
+            max_requests: 统一的时间窗口最大请求数（设置后忽略路由类别）
+            window_seconds: 统一的时间窗口（秒）
             exclude_paths: 排除的路径列表（不限流）
+            route_policies: {路径前缀: RateLimitPolicy 属性名}
+            key_func: 自定义键生成函数，接收 Request 返回限流键
+            read_policy: 未匹配 route_policies 的 GET/HEAD 请求使用的策略
+            write_policy: 未匹配 route_policies 的其他请求使用的策略
         """
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.exclude_paths = exclude_paths or ["/", "/health", "/docs", "/openapi.json", "/redoc"]
-
-    async def __call__(self, request: Request, call_next):
-        """处理请求"""
-        # 检查是否需要限流
-        if request.url.path in self.exclude_paths:
-            return await call_next(request)
-
-        # 生成限流键
-        limit_key = _get_default_key(request)
-
-        # 检查是否允许请求
-        allowed = await _rate_limiter.is_allowed(
-            limit_key,
-            self.max_requests,
-            self.window_seconds
+        self.app = app
+        self.fixed_policy = (
+            (max_requests, window_seconds or RateLimitPolicy.DEFAULT[1])
+            if max_requests else None
+        )
+        self.exclude_paths = {
+            _normalize_path(path)
+            for path in (exclude_paths or ["/", "/health", "/docs", "/openapi.json", "/redoc"])
+        }
+        # 长前缀优先匹配
+        self.route_policies = sorted(
+            ((_normalize_path(prefix), name) for prefix, name in (route_policies or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True
         )
+        self.read_policy = read_policy
+        self.write_policy = write_policy
+        for name in [name for _, name in self.route_policies] + [read_policy, write_policy]:
+            RateLimitPolicy.get(name)
+        self.key_func = key_func or _get_default_key
+        self.classify = lru_cache(maxsize=2048)(self._classify)
+
+    def _classify(self, method: str, path: str) -> Tuple[str, int, int]:
+        """返回 (计数桶, 最大请求数, 时间窗口)，path 需已经过 _normalize_path"""
+        if self.fixed_policy:
+            return ("default", *self.fixed_policy)
+
+        for prefix, name in self.route_policies:
+            if path == prefix or path.startswith(prefix + "/") or prefix == "/":
+                return (f"{name.lower()}:{prefix}", *RateLimitPolicy.get(name))
+
+        name = self.read_policy if method in ("GET", "HEAD") else self.write_policy
+        return (name.lower(), *RateLimitPolicy.get(name))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        """处理请求"""
+        # 只限流 HTTP 请求，CORS 预检请求不计数
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
-        if not allowed:
-            retry_after = self.window_seconds
-            return JSONResponse(
+        # 大小写不同或带尾部斜杠的路径（/ASR/Recognize/）不能绕开路由策略
+        path = _normalize_path(scope["path"])
+        if path in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        bucket, max_requests, window_seconds = self.classify(scope["method"], path)
+        limit_key = f"{bucket}:{self.key_func(Request(scope))}"
+
+        result = await _rate_limiter.hit(limit_key, max_requests, window_seconds)
+
+        if not result.allowed:
+            retry_after = int(result.headers["Retry-After"])
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
                     "code": -1,
@@ -267,28 +760,23 @@ class RateLimitMiddleware:
                         "retry_after": retry_after
                     }
                 },
-                headers={
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Limit": str(self.max_requests),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(time.time()) + retry_after)
-                }
+                headers=result.headers
             )
-
-        # 处理请求
-        response = await call_next(request)
+            await response(scope, receive, send)
+            return
 
         # 添加限流信息到响应头
-        remaining = await _rate_limiter.get_remaining_requests(limit_key)
-        if remaining is not None:
-            response.headers["X-RateLimit-Limit"] = str(self.max_requests)
-            response.headers["X-RateLimit-Remaining"] = str(max(0, self.max_requests - remaining))
-            response.headers["X-RateLimit-Reset"] = str(int(time.time()) + self.window_seconds)
+        rate_limit_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in result.headers.items()
+        ]
 
-        return response
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + rate_limit_headers
+            await send(message)
 
-
-from fastapi.responses import JSONResponse
+        await self.app(scope, receive, send_with_headers)
 
 
 # 预定义的限流策略
@@ -310,6 +798,21 @@ class RateLimitPolicy:
     # 昂贵操作（极低频）
     EXPENSIVE = (5, 60)  # 5 次/分钟
 
+    # 网关的粗粒度兜底（按 IP 计数，同一 NAT 后的用户共享配额）：
+    # 均不低于服务端的限额，只拦截明显的滥用，实际配额由各服务判断
+    AUTH_BACKSTOP = (60, 60)  # 60 次/分钟（服务端登录 20 次/分钟）
+    QUERY_BACKSTOP = (600, 60)  # 600 次/分钟
+    WRITE_BACKSTOP = (300, 60)  # 300 次/分钟
+    EXPENSIVE_BACKSTOP = (60, 60)  # 60 次/分钟（服务端按资源加权 30 配额/分钟）
+
+    @classmethod
+    def get(cls, name: str) -> Tuple[int, int]:
+        """按名称获取策略 (最大请求数, 时间窗口)"""
+        policy = getattr(cls, name.upper(), None)
+        if not isinstance(policy, tuple):
+            raise ValueError(f"Unknown rate limit policy: {name}")
+        return policy
+
 
 # 为特定端点添加限流的便捷函数
 def limit_auth(max_requests: int = 10, window_seconds: int = 60):
@@ -327,6 +830,24 @@ def limit_write(max_requests: int = 20, window_seconds: int = 60):
     return rate_limit(max_requests, window_seconds)
 
 
-def limit_expensive(max_requests: int = 5, window_seconds: int = 60):
-    """昂贵操作限流（如图片分析）"""
-    return rate_limit(max_requests, window_seconds)
+def limit_expensive(
+    max_requests: int = 5,
+    window_seconds: int = 60,
+    weighted: bool = True,
+    tier_multipliers: Optional[Dict[str, float]] = None
+):
+    """
+    昂贵操作限流（如图片分析、语音识别）
+
+    weighted 为 True 时 max_requests 表示配额总数，每个请求按上传的字节数、
+    图片像素或音频时长消耗配额（见 estimate_upload_cost），
+    端点注入了 current_user 时还按用户等级调整配额
+    """
+    if not weighted:
+        return rate_limit(max_requests, window_seconds)
+    return rate_limit(
+        max_requests,
+        window_seconds,
+        cost_func=estimate_upload_cost,
+        tier_multipliers=tier_multipliers or RATE_LIMIT_TIER_MULTIPLIERS
+    )
@@ -2,10 +2,11 @@
 词典 API - 查询单词信息
 """
 from typing import Optional, Dict, Any
-import httpx
 import os
 import logging
 
+from shared.utils.http_client import get_http_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,19 +55,19 @@ class DictionaryAPI:
             return None
 
         try:
-            async with httpx.AsyncClient() as client:
-                # 有道 API 调用
-                # 这里简化处理，实际需要签名等
-                params = {
-                    "q": english_word,
-                    "appKey": self.api_key,
-                }
-                response = await client.get(self.base_url, params=params)
-                data = response.json()
-
-                if data.get("errorCode") == "0":
-                    # 解析响应
-                    return self._parse_youdao_response(data)
+            client = get_http_client("youdao")
+            # 有道 API 调用
+            # 这里简化处理，实际需要签名等
+            params = {
+                "q": english_word,
+                "appKey": self.api_key,
+            }
+            response = await client.get(self.base_url, params=params)
+            data = response.json()
+
+            if data.get("errorCode") == "0":
+                # 解析响应
+                return self._parse_youdao_response(data)
         except Exception as e:
             print(f"Youdao API error: {e}")
 
@@ -75,27 +76,27 @@ class DictionaryAPI:
     async def _fetch_from_free_translation(self, english_word: str, timeout: float = 3.0) -> Optional[Dict[str, Any]]:
         """从免费翻译API获取单词信息（MyMemory API，超时3秒优化）"""
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                # MyMemory Translation API
-                url = "https://api.mymemory.translated.net/get"
-                params = {
-                    "q": english_word,
-                    "langpair": "en|zh-CN"
-                }
-                response = await client.get(url, params=params)
-                data = response.json()
-
-                if data.get("responseStatus") == 200:
-                    translated_text = data.get("responseData", {}).get("translatedText", "")
-                    if translated_text and translated_text != english_word:
-                        return {
-                            "english_word": english_word,
-                            "chinese_meaning": translated_text,
-                            "phonetic_us": "",
-                            "phonetic_uk": "",
-                            "example_sentence": "",
-                            "example_translation": ""
-                        }
+            client = get_http_client("mymemory")
+            # MyMemory Translation API
+            url = "https://api.mymemory.translated.net/get"
+            params = {
+                "q": english_word,
+                "langpair": "en|zh-CN"
+            }
+            response = await client.get(url, params=params, timeout=timeout)
+            data = response.json()
+
+            if data.get("responseStatus") == 200:
+                translated_text = data.get("responseData", {}).get("translatedText", "")
+                if translated_text and translated_text != english_word:
+                    return {
+                        "english_word": english_word,
+                        "chinese_meaning": translated_text,
+                        "phonetic_us": "",
+                        "phonetic_uk": "",
+                        "example_sentence": "",
+                        "example_translation": ""
+                    }
         except Exception as e:
             logger.warning(f"Free translation API error: {e}")
 
@@ -0,0 +1,79 @@
+"""
+单词详情缓存 - 按 word_id 批量读取单词信息
+"""
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.database.models import Word, WordResponse
+from shared.utils.cache import get_cache, CachePolicy
+
+logger = logging.getLogger(__name__)
+
+
+def word_cache_key(word_id: int) -> str:
+    """单词详情缓存键"""
+    return f"word:{word_id}"
+
+
+def word_lookup_cache_key(english_word: str) -> str:
+    """按英文单词查询（/lookup）的缓存键"""
+    return f"word_lookup:{english_word.lower()}"
+
+
+async def get_words_by_ids(
+    db: AsyncSession,
+    word_ids: Iterable[int]
+) -> Dict[int, WordResponse]:
+    """
+    批量获取单词详情
+
+    先用一次 Redis 往返批量读取缓存，未命中的单词用一条 SQL 查询补齐，
+    再批量写回缓存
+
+    Args:
+        db: 数据库会话
+        word_ids: 单词 ID 列表
+
+    Returns:
+        {word_id: WordResponse}，不存在的单词不包含在结果中
+    """
+    word_ids = list(dict.fromkeys(word_ids))
+    if not word_ids:
+        return {}
+
+    words: Dict[int, WordResponse] = {}
+    cache = get_cache()
+
+    if cache:
+        cached = await cache.mget(word_cache_key(word_id) for word_id in word_ids)
+        for word_id in word_ids:
+            data = cached.get(word_cache_key(word_id))
+            if data:
+                words[word_id] = WordResponse.model_validate(data)
+
+    missing = [word_id for word_id in word_ids if word_id not in words]
+    if missing:
+        result = await db.execute(select(Word).where(Word.word_id.in_(missing)))
+        loaded = {word.word_id: WordResponse.model_validate(word) for word in result.scalars().all()}
+        words.update(loaded)
+
+        if cache and loaded:
+            await cache.mset_with_ttl(
+                {word_cache_key(word_id): word.model_dump(mode="json") for word_id, word in loaded.items()},
+                CachePolicy.WORD_DETAIL_TTL
+            )
+
+    logger.debug(f"批量获取单词详情: {len(word_ids)} 个，缓存命中 {len(word_ids) - len(missing)} 个")
+    return words
+
+
+async def invalidate_words(*words: Word):
+    """单词创建或更新后清除缓存（按 word_id 的详情缓存和按英文单词的查询缓存）"""
+    cache = get_cache()
+    if cache and words:
+        keys = [word_cache_key(word.word_id) for word in words]
+        keys += [word_lookup_cache_key(word.english_word) for word in words]
+        await cache.delete(*keys)